@@ -0,0 +1,99 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject, User as TelegramUser
+from sqlalchemy import select, update
+
+from config import settings
+from database import async_session_maker
+from models import User
+
+ACCESS_ALLOWED = "allowed"
+ACCESS_BLOCKED = "blocked"
+ACCESS_UNKNOWN = "unknown"
+
+
+class UserAccessCache:
+    """LRU кеш статусу доступу користувачів з TTL"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[str]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        status, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return status
+
+    def set(self, user_id: int, status: str):
+        self._entries[user_id] = (status, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids: int):
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+
+
+# Кеш локальний для процесу; в інших процесах зміни стають видимими після TTL
+user_access_cache = UserAccessCache(
+    max_size=settings.ACCESS_CACHE_SIZE,
+    ttl_seconds=settings.ACCESS_CACHE_TTL_SECONDS
+)
+
+
+class AccessMiddleware(BaseMiddleware):
+    """Перевірка доступу перед будь-яким хендлером повідомлень і callback-запитів"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        from_user: Optional[TelegramUser] = data.get("event_from_user")
+        if from_user is None or from_user.id == settings.OWNER_ID:
+            return await handler(event, data)
+
+        status = user_access_cache.get(from_user.id)
+        if status is None:
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    select(User.is_blocked, User.bot_blocked_at).where(User.id == from_user.id)
+                )
+                user = result.one_or_none()
+                if user is not None and user.bot_blocked_at is not None:
+                    # Користувач знову пише боту, отже розблокував його - розсилки відновлюються
+                    await session.execute(update(User).where(User.id == from_user.id).values(bot_blocked_at=None))
+                    await session.commit()
+            if user is None:
+                status = ACCESS_UNKNOWN
+            else:
+                status = ACCESS_BLOCKED if user.is_blocked else ACCESS_ALLOWED
+            user_access_cache.set(from_user.id, status)
+
+        if status == ACCESS_ALLOWED:
+            return await handler(event, data)
+
+        if status == ACCESS_BLOCKED:
+            text = "🚫 <b>Доступ заборонено</b>\n\nВаш обліковий запис заблокований."
+        else:
+            text = "🚫 <b>Доступ заборонено</b>\n\nЦей бот доступний тільки авторизованим користувачам."
+        await self._deny(event, text)
+
+    @staticmethod
+    async def _deny(event: TelegramObject, text: str):
+        if isinstance(event, Message):
+            await event.answer(text, parse_mode="HTML")
+        elif isinstance(event, CallbackQuery):
+            await event.answer("🚫 Доступ заборонено", show_alert=True)
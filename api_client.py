@@ -1,6 +1,8 @@
 import aiohttp
+import time
 from typing import Optional, Dict, Any
 from config import settings
+from metrics import API_ERRORS, API_REQUEST_SECONDS, track_time
 
 
 class GmailFarmerAPI:
@@ -10,13 +12,51 @@ class GmailFarmerAPI:
         self.base_url = f"{settings.API_DOMAIN}/api/v1/accounts"
         self.api_key = settings.API_KEY
         self.headers = {"key": self.api_key}
+        self.timeouts = {
+            "/price": aiohttp.ClientTimeout(total=settings.API_PRICE_TIMEOUT_SECONDS),
+            "/balance": aiohttp.ClientTimeout(total=settings.API_BALANCE_TIMEOUT_SECONDS),
+            "/buy": aiohttp.ClientTimeout(total=settings.API_BUY_TIMEOUT_SECONDS),
+        }
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def start(self):
+        """Відкрити довготривалу сесію з пулом з'єднань"""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=settings.API_CONNECTOR_LIMIT,
+            limit_per_host=settings.API_CONNECTOR_LIMIT_PER_HOST,
+            keepalive_timeout=settings.API_KEEPALIVE_SECONDS,
+            ttl_dns_cache=settings.API_DNS_CACHE_SECONDS,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=settings.API_DEFAULT_TIMEOUT_SECONDS),
+        )
+    
+    async def close(self):
+        """Закрити сесію та всі з'єднання пулу"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
     
     async def _request(self, method: str, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
         """Базовий метод для HTTP запитів"""
         url = f"{self.base_url}{endpoint}"
+        session = await self._get_session()
+        timeout = self.timeouts.get(endpoint)
+        started = time.perf_counter()
+        status: Optional[int] = None
         
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method, url, headers=self.headers, params=params) as response:
+        try:
+            async with session.request(method, url, params=params, timeout=timeout) as response:
+                status = response.status
                 if response.status == 200:
                     return await response.json()
                 elif response.status == 402:
@@ -28,6 +68,14 @@ class GmailFarmerAPI:
                 else:
                     error_data = await response.json()
                     raise Exception(f"API Error: {error_data.get('message', 'Unknown error')}")
+        except Exception as e:
+            # HTTP статус, якщо відповідь отримано, інакше тип помилки (таймаут, з'єднання)
+            API_ERRORS.labels(endpoint, str(status) if status is not None else type(e).__name__).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            API_REQUEST_SECONDS.labels(endpoint).observe(elapsed)
+            track_time("api", elapsed)
     
     async def get_price(self, is_2fa: bool = False) -> float:
         """Отримати поточну ціну акаунта"""
@@ -49,4 +97,4 @@ class GmailFarmerAPI:
         return await self._request("GET", "/buy", params)
 
 
-api_client = GmailFarmerAPI()
\ No newline at end of file
+api_client = GmailFarmerAPI()
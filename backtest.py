@@ -0,0 +1,347 @@
+"""Бектест ордерів на історичних цінах
+
+    python backtest.py --balance 100 --days 90
+    python backtest.py --balance 100 --orders-csv orders.csv --prices-csv prices.csv --output fills.csv
+
+Правила збігаються з OrderProcessor.process_orders: на кожному тіку ордери з target_price >= ціни
+обробляються за зростанням (target_price, id), покупка резервує ціну * кількість з балансу,
+ордер без достатнього балансу пропускається і перевіряється на наступних тіках.
+Всі ордери вважаються виставленими на початку періоду (або з created_at для CSV).
+"""
+import argparse
+import asyncio
+import csv
+import heapq
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import IO, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Order, PriceHistory, PriceRollup
+from price_history import RESOLUTION_DAY, RESOLUTION_HOUR, RESOLUTION_MINUTE, RESOLUTION_RAW, retention
+
+BLOCK_SIZE = 1024
+FETCH_SIZE = 50_000
+
+
+@dataclass(frozen=True)
+class BacktestOrder:
+    id: int
+    target_price: float
+    quantity: int
+    is_2fa: bool
+    created_at: Optional[datetime] = None
+
+
+@dataclass
+class PriceTape:
+    """Послідовність тіків з цінами обох типів"""
+    timestamps: np.ndarray
+    no_2fa: np.ndarray
+    with_2fa: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def prices(self, is_2fa: bool) -> np.ndarray:
+        return self.with_2fa if is_2fa else self.no_2fa
+
+    def index_at(self, timestamp: datetime) -> int:
+        return int(np.searchsorted(self.timestamps, np.datetime64(timestamp, "us"), side="left"))
+
+
+class MinIndex:
+    """Пошук першого тіку з ціною не вище порогу через мінімуми блоків"""
+
+    def __init__(self, values: np.ndarray, block_size: int = BLOCK_SIZE):
+        self.values = values
+        self.block_size = block_size
+        padded = np.concatenate((values, np.full((-len(values)) % block_size, np.inf)))
+        self.block_min = padded.reshape(-1, block_size).min(axis=1) if len(padded) else np.empty(0)
+
+    def first_at_or_below(self, threshold: float, start: int) -> int:
+        """Індекс першого тіку >= start з ціною <= threshold або -1"""
+        if start >= len(self.values):
+            return -1
+        block = start // self.block_size
+        block_end = min((block + 1) * self.block_size, len(self.values))
+        hits = np.flatnonzero(self.values[start:block_end] <= threshold)
+        if len(hits):
+            return start + int(hits[0])
+
+        blocks = np.flatnonzero(self.block_min[block + 1:] <= threshold)
+        if not len(blocks):
+            return -1
+        block = block + 1 + int(blocks[0])
+        segment = self.values[block * self.block_size:(block + 1) * self.block_size]
+        return block * self.block_size + int(np.argmax(segment <= threshold))
+
+
+@dataclass(frozen=True)
+class Fill:
+    order_id: int
+    is_2fa: bool
+    tick: int
+    timestamp: datetime
+    price: float
+    quantity: int
+    cost: float
+    balance_after: float
+
+
+@dataclass
+class BacktestReport:
+    orders: List[BacktestOrder]
+    fills: List[Fill]
+    initial_balance: float
+    final_balance: float
+    ticks: int
+    start: Optional[datetime]
+    end: Optional[datetime]
+    balance_skips: int = 0
+
+    @property
+    def spent(self) -> float:
+        return self.initial_balance - self.final_balance
+
+    @property
+    def unfilled(self) -> List[BacktestOrder]:
+        filled_ids = {fill.order_id for fill in self.fills}
+        return [order for order in self.orders if order.id not in filled_ids]
+
+    def summary(self) -> str:
+        lines = [
+            f"Період: {self.start or '-'} — {self.end or '-'} ({self.ticks} тіків)",
+            f"Ордерів: {len(self.orders)}, виконано: {len(self.fills)}, не виконано: {len(self.unfilled)}",
+        ]
+        for is_2fa, label in ((False, "Без 2FA"), (True, "З 2FA")):
+            fills = [fill for fill in self.fills if fill.is_2fa == is_2fa]
+            if not fills:
+                continue
+            accounts = sum(fill.quantity for fill in fills)
+            cost = sum(fill.cost for fill in fills)
+            lines.append(f"{label}: {len(fills)} ордерів, {accounts} акаунтів, ${cost:.2f} (в середньому ${cost / accounts:.4f} за шт)")
+        lines.append(f"Баланс: ${self.initial_balance:.2f} → ${self.final_balance:.2f} (витрачено ${self.spent:.2f})")
+        lines.append(f"Пропусків через нестачу балансу: {self.balance_skips}")
+
+        waits = [
+            fill.timestamp - order.created_at
+            for order, fill in self._filled_pairs()
+            if order.created_at is not None
+        ]
+        if waits:
+            lines.append(f"Середній час до виконання: {sum(waits, timedelta()) / len(waits)}")
+        return "\n".join(lines)
+
+    def _filled_pairs(self):
+        orders = {order.id: order for order in self.orders}
+        return [(orders[fill.order_id], fill) for fill in self.fills]
+
+    def write_csv(self, file: IO[str]):
+        writer = csv.writer(file)
+        writer.writerow(["order_id", "is_2fa", "target_price", "quantity", "filled_at", "price", "cost", "balance_after"])
+        fills = {fill.order_id: fill for fill in self.fills}
+        for order in self.orders:
+            fill = fills.get(order.id)
+            writer.writerow([
+                order.id, int(order.is_2fa), order.target_price, order.quantity,
+                fill.timestamp.isoformat() if fill else "",
+                f"{fill.price:.4f}" if fill else "",
+                f"{fill.cost:.2f}" if fill else "",
+                f"{fill.balance_after:.2f}" if fill else "",
+            ])
+
+
+def run_backtest(tape: PriceTape, orders: Sequence[BacktestOrder], balance: float) -> BacktestReport:
+    """Програти тіки проти ордерів; пропускаються тіки, на яких жоден ордер не може виконатись"""
+    indexes = {is_2fa: MinIndex(tape.prices(is_2fa)) for is_2fa in (False, True)}
+    available = balance
+    fills: List[Fill] = []
+    balance_skips = 0
+
+    # Подія - найраніший тік, на якому ордер може виконатись за ціною і поточним балансом
+    events = []
+    for position, order in enumerate(orders):
+        start = tape.index_at(order.created_at) if order.created_at is not None else 0
+        tick = indexes[order.is_2fa].first_at_or_below(order.target_price, start)
+        if tick >= 0:
+            events.append((tick, position))
+    heapq.heapify(events)
+
+    while events:
+        tick = events[0][0]
+        candidates = []
+        while events and events[0][0] == tick:
+            candidates.append(heapq.heappop(events)[1])
+        candidates.sort(key=lambda position: (orders[position].target_price, orders[position].id))
+
+        skipped = []
+        for position in candidates:
+            order = orders[position]
+            price = float(tape.prices(order.is_2fa)[tick])
+            cost = price * order.quantity
+            if cost > available:
+                skipped.append(position)
+                continue
+            available -= cost
+            fills.append(Fill(
+                order_id=order.id,
+                is_2fa=order.is_2fa,
+                tick=tick,
+                timestamp=tape.timestamps[tick].astype(datetime),
+                price=price,
+                quantity=order.quantity,
+                cost=cost,
+                balance_after=available
+            ))
+
+        # Баланс лише зменшується, тому ордер може виконатись не раніше, ніж ціна впаде до available / quantity
+        for position in skipped:
+            order = orders[position]
+            balance_skips += 1
+            threshold = min(order.target_price, available / order.quantity)
+            next_tick = indexes[order.is_2fa].first_at_or_below(threshold, tick + 1)
+            if next_tick >= 0:
+                heapq.heappush(events, (next_tick, position))
+
+    return BacktestReport(
+        orders=list(orders),
+        fills=fills,
+        initial_balance=balance,
+        final_balance=available,
+        ticks=len(tape),
+        start=tape.timestamps[0].astype(datetime) if len(tape) else None,
+        end=tape.timestamps[-1].astype(datetime) if len(tape) else None,
+        balance_skips=balance_skips
+    )
+
+
+def tape_resolution(start: datetime, now: Optional[datetime] = None) -> str:
+    """Найдрібніший рівень історії, що ще зберігається від start"""
+    now = now or datetime.utcnow()
+    for resolution in (RESOLUTION_RAW, RESOLUTION_MINUTE, RESOLUTION_HOUR):
+        keep = retention(resolution)
+        if keep is None or start >= now - keep:
+            return resolution
+    return RESOLUTION_DAY
+
+
+async def load_price_tape(session: AsyncSession, start: datetime, end: datetime, resolution: Optional[str] = None) -> PriceTape:
+    """Завантажити тіки з БД порціями; для свічок ціною тіку вважається low"""
+    resolution = resolution or tape_resolution(start)
+
+    if resolution == RESOLUTION_RAW:
+        query = select(PriceHistory.timestamp, PriceHistory.price_no_2fa, PriceHistory.price_2fa).where(
+            PriceHistory.timestamp >= start,
+            PriceHistory.timestamp < end
+        ).order_by(PriceHistory.timestamp, PriceHistory.id)
+        timestamps, no_2fa, with_2fa = await _stream_columns(session, query)
+        return PriceTape(timestamps, no_2fa, with_2fa)
+
+    sides = []
+    for is_2fa in (False, True):
+        query = select(PriceRollup.bucket_start, PriceRollup.low).where(
+            PriceRollup.resolution == resolution,
+            PriceRollup.is_2fa == is_2fa,
+            PriceRollup.bucket_start >= start,
+            PriceRollup.bucket_start < end
+        ).order_by(PriceRollup.bucket_start)
+        sides.append(await _stream_columns(session, query))
+
+    (timestamps_no_2fa, lows_no_2fa), (timestamps_2fa, lows_2fa) = sides
+    timestamps, no_2fa_index, with_2fa_index = np.intersect1d(timestamps_no_2fa, timestamps_2fa, return_indices=True)
+    return PriceTape(timestamps, lows_no_2fa[no_2fa_index], lows_2fa[with_2fa_index])
+
+
+async def _stream_columns(session: AsyncSession, query) -> List[np.ndarray]:
+    """Перша колонка - datetime64, решта - float64"""
+    chunks = []
+    result = await session.stream(query.execution_options(yield_per=FETCH_SIZE))
+    async for partition in result.partitions():
+        columns = list(zip(*partition))
+        chunks.append(
+            [np.array(columns[0], dtype="datetime64[us]")]
+            + [np.array(column, dtype=np.float64) for column in columns[1:]]
+        )
+    if not chunks:
+        width = len(query.selected_columns)
+        return [np.empty(0, dtype="datetime64[us]")] + [np.empty(0) for _ in range(width - 1)]
+    return [np.concatenate(parts) for parts in zip(*chunks)]
+
+
+async def load_orders(session: AsyncSession, statuses: Sequence[str]) -> List[BacktestOrder]:
+    result = await session.execute(
+        select(Order.id, Order.target_price, Order.quantity, Order.is_2fa).where(
+            Order.status.in_(statuses)
+        ).order_by(Order.id)
+    )
+    return [BacktestOrder(*row) for row in result.all()]
+
+
+def read_orders_csv(path: str) -> List[BacktestOrder]:
+    """CSV з колонками id,target_price,quantity,is_2fa[,created_at]"""
+    with open(path, newline="") as file:
+        return [
+            BacktestOrder(
+                id=int(row["id"]),
+                target_price=float(row["target_price"]),
+                quantity=int(row["quantity"]),
+                is_2fa=row["is_2fa"].strip().lower() in ("1", "true", "yes"),
+                created_at=datetime.fromisoformat(row["created_at"]) if row.get("created_at") else None
+            )
+            for row in csv.DictReader(file)
+        ]
+
+
+def read_prices_csv(path: str) -> PriceTape:
+    """CSV з колонками timestamp,price_no_2fa,price_2fa, відсортований за часом"""
+    with open(path, newline="") as file:
+        rows = list(csv.DictReader(file))
+    return PriceTape(
+        timestamps=np.array([row["timestamp"] for row in rows], dtype="datetime64[us]"),
+        no_2fa=np.array([row["price_no_2fa"] for row in rows], dtype=np.float64),
+        with_2fa=np.array([row["price_2fa"] for row in rows], dtype=np.float64)
+    )
+
+
+async def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Бектест ордерів на історичних цінах")
+    parser.add_argument("--balance", type=float, required=True, help="Стартовий баланс API, $")
+    parser.add_argument("--days", type=int, default=90, help="Глибина історії в днях")
+    parser.add_argument("--resolution", choices=(RESOLUTION_RAW, RESOLUTION_MINUTE, RESOLUTION_HOUR, RESOLUTION_DAY),
+                        help="Рівень історії (за замовчуванням найдрібніший доступний)")
+    parser.add_argument("--status", action="append", help="Статуси ордерів з БД (за замовчуванням active)")
+    parser.add_argument("--orders-csv", help="Ордери з CSV замість БД")
+    parser.add_argument("--prices-csv", help="Тіки з CSV замість БД")
+    parser.add_argument("--output", help="Записати результат по кожному ордеру в CSV")
+    args = parser.parse_args(argv)
+
+    orders = read_orders_csv(args.orders_csv) if args.orders_csv else None
+    tape = read_prices_csv(args.prices_csv) if args.prices_csv else None
+
+    if orders is None or tape is None:
+        from database import async_read_session_maker, read_engine
+        end = datetime.utcnow()
+        try:
+            async with async_read_session_maker() as session:
+                if orders is None:
+                    orders = await load_orders(session, args.status or ["active"])
+                if tape is None:
+                    tape = await load_price_tape(session, end - timedelta(days=args.days), end, args.resolution)
+        finally:
+            await read_engine.dispose()
+
+    report = run_backtest(tape, orders, args.balance)
+    print(report.summary())
+
+    if args.output:
+        with open(args.output, "w", newline="") as file:
+            report.write_csv(file)
+        print(f"Звіт по ордерах: {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import random
+import socket
+import uuid
+from collections import Counter
+from typing import Dict, Optional
+
+from aiohttp import web
+
+API_PREFIX = "/api/v1/accounts"
+
+
+def free_port(host: str = "127.0.0.1") -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class FakeGmailFarmerAPI:
+    """Локальна заміна /price, /balance і /buy з налаштовуваними затримкою, помилками та розміром пакетів"""
+
+    def __init__(
+        self,
+        latency_ms: float = 5.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        price_no_2fa: float = 1.0,
+        price_2fa: float = 2.0,
+        balance: float = 1_000_000_000.0,
+        field_size: int = 24,
+        seed: int = 0
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.prices = {False: price_no_2fa, True: price_2fa}
+        self.balance = balance
+        self.field_size = field_size
+        self.random = random.Random(seed)
+        self.requests: Counter = Counter()
+        self._accounts_json: Dict[int, str] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_get(f"{API_PREFIX}/price", self.handle_price)
+        self.app.router.add_get(f"{API_PREFIX}/balance", self.handle_balance)
+        self.app.router.add_get(f"{API_PREFIX}/buy", self.handle_buy)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запустити сервер і повернути його адресу для API_DOMAIN"""
+        port = port or free_port(host)
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host=host, port=port).start()
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _simulate(self, endpoint: str) -> Optional[web.Response]:
+        self.requests[endpoint] += 1
+        delay = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return web.json_response({"message": "Fake API error"}, status=500)
+        return None
+
+    @staticmethod
+    def _is_2fa(request: web.Request) -> bool:
+        return request.query.get("is2fa", "false") == "true"
+
+    async def handle_price(self, request: web.Request) -> web.Response:
+        error = await self._simulate("price")
+        if error is not None:
+            return error
+        return web.json_response({"usdPrice": self.prices[self._is_2fa(request)]})
+
+    async def handle_balance(self, request: web.Request) -> web.Response:
+        error = await self._simulate("balance")
+        if error is not None:
+            return error
+        return web.json_response({"balance": self.balance})
+
+    async def handle_buy(self, request: web.Request) -> web.Response:
+        error = await self._simulate("buy")
+        if error is not None:
+            return error
+
+        count = int(request.query.get("count", "1"))
+        is_2fa = self._is_2fa(request)
+        price = self.prices[is_2fa]
+        if price * count > self.balance:
+            return web.json_response({"message": "Insufficient balance"}, status=402)
+        self.balance -= price * count
+
+        header = json.dumps({
+            "packId": uuid.uuid4().hex,
+            "accountsCount": count,
+            "usdPrice": price,
+            "totalUsdPrice": price * count,
+            "is2fa": is_2fa,
+        })
+        # Акаунти серіалізуються один раз на розмір пакета, щоб час сервера не домінував у вимірах
+        body = f'{header[:-1]}, "accounts": {self._accounts(count)}}}'
+        return web.Response(text=body, content_type="application/json")
+
+    def _accounts(self, count: int) -> str:
+        cached = self._accounts_json.get(count)
+        if cached is None:
+            filler = "x" * self.field_size
+            cached = json.dumps([
+                {
+                    "email": f"user{index}.{filler}@gmail.com",
+                    "password": filler,
+                    "recoveryEmail": f"recovery{index}.{filler}@mail.com",
+                    "recoveryEmailMessagesUrl": f"https://mail.example.com/{filler}/{index}",
+                    "authenticatorToken2FA": filler,
+                    "appPassword": filler,
+                    "messagesUrl": f"https://messages.example.com/{filler}/{index}",
+                }
+                for index in range(count)
+            ])
+            self._accounts_json[count] = cached
+        return cached
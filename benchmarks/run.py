@@ -0,0 +1,413 @@
+"""Відтворюваний бенчмарк гарячих шляхів бота проти локального фейкового Gmail Farmer API.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --only process_orders --compare results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.fake_api import FakeGmailFarmerAPI, free_port
+
+EXPORT_FORMATS = ("txt", "csv", "json", "zip")
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    params: Dict[str, Any]
+    runs: List[float] = field(default_factory=list)
+    extras: Dict[str, Any] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "params": self.params,
+            "runs": [round(run, 6) for run in self.runs],
+            "min": round(min(self.runs), 6),
+            "median": round(statistics.median(self.runs), 6),
+            "mean": round(statistics.fmean(self.runs), 6),
+            "max": round(max(self.runs), 6),
+            "extras": self.extras,
+        }
+
+
+# ============ TELEGRAM STUBS ============
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.username = f"user{user_id}"
+        self.first_name = "Bench"
+
+
+class FakeBot:
+    """Приймає send_message без мережі; latency_ms імітує відповідь Telegram"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.sent = 0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs: Any):
+        await asyncio.sleep(self.latency)
+        self.sent += 1
+
+
+class FakeMessage:
+    def __init__(self, user_id: int):
+        self.from_user = FakeUser(user_id)
+        self.answers: List[str] = []
+        self.document_bytes = 0
+
+    async def answer(self, text: str, **kwargs: Any):
+        self.answers.append(text)
+
+    async def answer_document(self, document, **kwargs: Any):
+        # Файл вичитується повністю, як це робить aiogram при відправці
+        async for chunk in document.read(None):
+            self.document_bytes += len(chunk)
+
+
+class FakeCallback:
+    def __init__(self, user_id: int, data: str):
+        self.from_user = FakeUser(user_id)
+        self.data = data
+        self.message = FakeMessage(user_id)
+        self.answers: List[str] = []
+
+    async def answer(self, text: Optional[str] = None, **kwargs: Any):
+        self.answers.append(text)
+
+
+# ============ RUNNER ============
+class BenchmarkSuite:
+    def __init__(self, args: argparse.Namespace, fake_api: FakeGmailFarmerAPI):
+        from database import engine
+
+        self.args = args
+        self.fake_api = fake_api
+        self.engine = engine
+        self.results: List[BenchmarkResult] = []
+
+    def selected(self, name: str) -> bool:
+        return not self.args.only or any(name.startswith(prefix) for prefix in self.args.only)
+
+    async def measure(
+        self,
+        name: str,
+        params: Dict[str, Any],
+        body: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+        prepare: Optional[Callable[[], Awaitable[None]]] = None,
+        setup: Optional[Callable[[], Awaitable[None]]] = None,
+        repeat: Optional[int] = None
+    ):
+        """prepare - один раз перед сценарієм, setup - перед кожним прогоном; обидва поза виміром"""
+        if not self.selected(name):
+            return
+        result = BenchmarkResult(name=name, params=params)
+        if prepare is not None:
+            await prepare()
+        for _ in range(repeat or self.args.repeat):
+            if setup is not None:
+                await setup()
+            requests_before = sum(self.fake_api.requests.values())
+            started = time.perf_counter()
+            extras = await body()
+            result.runs.append(time.perf_counter() - started)
+            result.extras = dict(extras or {}, api_requests=sum(self.fake_api.requests.values()) - requests_before)
+        self.results.append(result)
+        print(f"{name:<40} median {statistics.median(result.runs) * 1000:10.1f} ms  ({len(result.runs)} runs)")
+
+    async def _reseed(self, seeder: Callable[[Any], Awaitable[Any]]) -> Any:
+        from database import async_session_maker
+        from benchmarks.seed import reset_database
+
+        await reset_database(self.engine)
+        async with async_session_maker() as session:
+            seeded = await seeder(session)
+            await session.commit()
+        return seeded
+
+    async def run(self):
+        from benchmarks.seed import prepare_database
+
+        await prepare_database(self.engine)
+        for orders in self.args.orders:
+            await self.bench_process_orders(orders)
+        await self.bench_execute_purchase()
+        await self.bench_price_notifications()
+        for cold in (False, True):
+            await self.bench_statistics(cold)
+        for fmt in EXPORT_FORMATS:
+            await self.bench_download_accounts(fmt)
+
+    async def bench_process_orders(self, orders: int):
+        from order_processor import order_processor
+        from benchmarks.seed import seed_active_orders
+
+        prices = self.fake_api.prices
+
+        async def setup():
+            await self._reseed(lambda session: seed_active_orders(
+                session, orders, users=max(orders // 10, 1), prices=prices,
+                fillable_fraction=self.args.fillable_fraction, seed=self.args.seed
+            ))
+
+        async def body():
+            executed = await order_processor.process_orders()
+            return {"executed": len(executed)}
+
+        await self.measure(
+            f"process_orders[{orders}]",
+            {"orders": orders, "fillable_fraction": self.args.fillable_fraction},
+            body, setup=setup
+        )
+
+    async def bench_execute_purchase(self):
+        from sqlalchemy import update
+        from database import async_session_maker
+        from models import Order
+        from order_processor import order_processor
+        from benchmarks.seed import seed_active_orders
+
+        pack_size = self.args.pack_size
+        worker_id = uuid.uuid4().hex
+        claimed = []
+
+        async def setup():
+            await self._reseed(lambda session: seed_active_orders(
+                session, 1, users=1, prices=self.fake_api.prices, fillable_fraction=1.0,
+                max_quantity=pack_size, seed=self.args.seed
+            ))
+            # Кількість фіксована, щоб кожен прогін купував повний пакет
+            async with async_session_maker() as session:
+                await session.execute(update(Order).values(quantity=pack_size))
+                await session.commit()
+            _, claimed[:] = await order_processor._claim_orders(worker_id, self.fake_api.prices, [])
+
+        async def body():
+            order_info = await order_processor._execute_purchase(claimed[0], worker_id)
+            return {"accounts": order_info["accounts_count"]}
+
+        await self.measure(f"execute_purchase[{pack_size}]", {"pack_size": pack_size}, body, setup=setup)
+
+    async def bench_price_notifications(self):
+        from scheduler import BotScheduler
+        from benchmarks.seed import seed_users
+
+        users = self.args.users
+        bot = FakeBot(latency_ms=self.args.bot_latency_ms)
+        bot_scheduler = BotScheduler(bot)
+
+        async def prepare():
+            await self._reseed(lambda session: seed_users(session, users, seed=self.args.seed))
+
+        async def body():
+            sent_before = bot.sent
+            await bot_scheduler.send_price_notifications()
+            return {"sent": bot.sent - sent_before}
+
+        await self.measure(
+            f"send_price_notifications[{users}]",
+            {"users": users, "bot_latency_ms": self.args.bot_latency_ms},
+            body, prepare=prepare
+        )
+
+    async def bench_statistics(self, cold: bool):
+        from database import async_read_session_maker, async_session_maker
+        from handlers import handle_statistics_button
+        from stats import rebuild_user_stats
+        from benchmarks.seed import drop_user_stats, seed_order_history
+
+        user_id = 1
+        history = self.args.history_orders
+
+        async def prepare():
+            await self._reseed(lambda session: seed_order_history(
+                session, user_id, completed_orders=history, active_orders=history // 10,
+                accounts_per_order=1, seed=self.args.seed
+            ))
+
+        async def setup():
+            async with async_session_maker() as session:
+                if cold:
+                    await drop_user_stats(session, user_id)
+                else:
+                    await rebuild_user_stats(session, user_id)
+                await session.commit()
+
+        async def body():
+            message = FakeMessage(user_id)
+            async with async_read_session_maker() as session:
+                await handle_statistics_button(message, session)
+            return {"answered": len(message.answers)}
+
+        await self.measure(
+            f"handle_statistics_button[{'cold' if cold else 'warm'}]",
+            {"completed_orders": history, "cached_stats": not cold},
+            body, prepare=prepare, setup=setup
+        )
+
+    async def bench_download_accounts(self, fmt: str):
+        from database import async_read_session_maker
+        from handlers import download_accounts_handler
+        from benchmarks.seed import seed_order_history
+
+        user_id = 1
+        pack_size = self.args.pack_size
+        order_ids = []
+
+        async def prepare():
+            order_ids[:] = await self._reseed(lambda session: seed_order_history(
+                session, user_id, completed_orders=1, active_orders=0,
+                accounts_per_order=pack_size, seed=self.args.seed
+            ))
+
+        async def body():
+            callback = FakeCallback(user_id, f"download_accounts:{order_ids[0]}:{fmt}")
+            async with async_read_session_maker() as session:
+                await download_accounts_handler(callback, session)
+            return {"bytes": callback.message.document_bytes}
+
+        await self.measure(
+            f"download_accounts[{fmt}]",
+            {"format": fmt, "accounts": pack_size},
+            body, prepare=prepare
+        )
+
+
+# ============ REPORT ============
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(suite: BenchmarkSuite, args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": suite.engine.dialect.name,
+        "seed": args.seed,
+        "fake_api": {
+            "latency_ms": args.api_latency_ms,
+            "jitter_ms": args.api_jitter_ms,
+            "error_rate": args.api_error_rate,
+            "field_size": args.field_size,
+        },
+        "benchmarks": [result.as_dict() for result in suite.results],
+    }
+
+
+def print_comparison(report: Dict[str, Any], baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = json.load(file)
+    previous = {item["name"]: item["median"] for item in baseline.get("benchmarks", [])}
+
+    print(f"\nComparison with {baseline.get('commit') or baseline_path} (median):")
+    for item in report["benchmarks"]:
+        before = previous.get(item["name"])
+        if not before:
+            print(f"{item['name']:<40} {item['median'] * 1000:10.1f} ms  (new)")
+            continue
+        change = (item["median"] - before) / before * 100
+        print(f"{item['name']:<40} {before * 1000:10.1f} -> {item['median'] * 1000:10.1f} ms  {change:+7.1f}%")
+
+
+def _sizes(value: str) -> List[int]:
+    return [int(size) for size in value.split(",") if size]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк гарячих шляхів бота з фейковим Gmail Farmer API")
+    parser.add_argument("--repeat", type=int, default=5, help="прогонів на сценарій")
+    parser.add_argument("--only", nargs="*", default=[], help="префікси назв сценаріїв")
+    parser.add_argument("--output", default="benchmark-results.json", help="файл результатів (JSON)")
+    parser.add_argument("--compare", help="попередній файл результатів для порівняння")
+    parser.add_argument("--database-url", help="окрема БД для бенчмарку; за замовчуванням тимчасовий SQLite")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--orders", type=_sizes, default=[1000, 10000, 100000], help="кількості активних ордерів через кому")
+    parser.add_argument("--fillable-fraction", type=float, default=0.01, help="частка ордерів, виконуваних за поточною ціною")
+    parser.add_argument("--pack-size", type=int, default=3000, help="акаунтів у пакеті покупки і експорту")
+    parser.add_argument("--users", type=int, default=50000, help="отримувачів розсилки цін")
+    parser.add_argument("--history-orders", type=int, default=1000, help="виконаних ордерів у статистиці користувача")
+    parser.add_argument("--bot-latency-ms", type=float, default=0.0)
+    parser.add_argument("--api-latency-ms", type=float, default=5.0)
+    parser.add_argument("--api-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--field-size", type=int, default=24, help="довжина полів акаунта у відповіді /buy")
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    scratch_dir = None
+    if args.database_url is None:
+        scratch_dir = tempfile.mkdtemp(prefix="predfarmbot-bench-")
+        args.database_url = f"sqlite+aiosqlite:///{os.path.join(scratch_dir, 'bench.db')}"
+
+    port = free_port()
+    # Налаштування читаються при імпорті config, тому модулі бота імпортуються лише після цього
+    os.environ.update({
+        "DATABASE_URL": args.database_url,
+        "DATABASE_REPLICA_URL": "",
+        "API_DOMAIN": f"http://127.0.0.1:{port}",
+        "API_KEY": "benchmark",
+    })
+    # Ліміт Telegram вимірює не код, а паузи, тому за замовчуванням знятий
+    os.environ.setdefault("BROADCAST_RATE_PER_SECOND", "1000000")
+
+    fake_api = FakeGmailFarmerAPI(
+        latency_ms=args.api_latency_ms,
+        jitter_ms=args.api_jitter_ms,
+        error_rate=args.api_error_rate,
+        field_size=args.field_size,
+        seed=args.seed
+    )
+    await fake_api.start(port=port)
+
+    from api_client import api_client
+
+    suite = BenchmarkSuite(args, fake_api)
+    try:
+        await suite.run()
+    finally:
+        await api_client.close()
+        await fake_api.stop()
+        await suite.engine.dispose()
+        if scratch_dir is not None:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    report = build_report(suite, args)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        print_comparison(report, args.compare)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
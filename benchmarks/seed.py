@@ -0,0 +1,155 @@
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import insert, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from models import Account, Base, Order, Purchase, User, UserStats
+
+CHUNK_SIZE = 5000
+
+
+class SeedError(Exception):
+    pass
+
+
+async def prepare_database(engine: AsyncEngine):
+    """Створити схему з моделей; робоча БД бота (з таблицею alembic_version) не приймається"""
+    async with engine.begin() as conn:
+        tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+        if "alembic_version" in tables:
+            raise SeedError("Database is managed by alembic; benchmarks need a separate scratch database")
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def reset_database(engine: AsyncEngine):
+    """Очистити всі таблиці перед наступним сценарієм"""
+    async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            names = ", ".join(table.name for table in Base.metadata.sorted_tables)
+            await conn.execute(text(f"TRUNCATE {names} RESTART IDENTITY CASCADE"))
+            return
+        for table in reversed(Base.metadata.sorted_tables):
+            await conn.execute(table.delete())
+
+
+async def _bulk_insert(session: AsyncSession, model, rows: List[dict]):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        await session.execute(insert(model), rows[start:start + CHUNK_SIZE])
+
+
+def fake_account(index: int, field_size: int = 24) -> dict:
+    filler = "x" * field_size
+    return {
+        "email": f"user{index}.{filler}@gmail.com",
+        "password": filler,
+        "recovery_email": f"recovery{index}.{filler}@mail.com",
+        "recovery_email_messages_url": f"https://mail.example.com/{filler}/{index}",
+        "authenticator_token_2fa": filler,
+        "app_password": filler,
+        "messages_url": f"https://messages.example.com/{filler}/{index}",
+        "status": "available",
+    }
+
+
+async def seed_users(session: AsyncSession, count: int, blocked_fraction: float = 0.0, seed: int = 0) -> List[int]:
+    rng = random.Random(seed)
+    rows = [
+        {"id": user_id, "username": f"user{user_id}", "first_name": "Bench", "is_blocked": rng.random() < blocked_fraction}
+        for user_id in range(1, count + 1)
+    ]
+    await _bulk_insert(session, User, rows)
+    return [row["id"] for row in rows]
+
+
+async def seed_active_orders(
+    session: AsyncSession,
+    count: int,
+    users: int,
+    prices: dict,
+    fillable_fraction: float,
+    max_quantity: int = 5,
+    seed: int = 0
+):
+    """Активні ордери; частка fillable_fraction має цільову ціну не нижче поточної"""
+    rng = random.Random(seed)
+    await seed_users(session, users, seed=seed)
+    rows = []
+    for _ in range(count):
+        is_2fa = rng.random() < 0.5
+        price = prices[is_2fa]
+        if rng.random() < fillable_fraction:
+            target_price = round(price * rng.uniform(1.0, 1.2), 2)
+        else:
+            target_price = round(price * rng.uniform(0.5, 0.98), 2)
+        rows.append({
+            "user_id": rng.randint(1, users),
+            "target_price": target_price,
+            "quantity": rng.randint(1, max_quantity),
+            "is_2fa": is_2fa,
+            "status": "active",
+        })
+    await _bulk_insert(session, Order, rows)
+
+
+async def seed_order_history(
+    session: AsyncSession,
+    user_id: int,
+    completed_orders: int,
+    active_orders: int,
+    accounts_per_order: int,
+    field_size: int = 24,
+    seed: int = 0
+) -> List[int]:
+    """Користувач з виконаними ордерами (покупки та акаунти) і активними ордерами; повертає id виконаних"""
+    rng = random.Random(seed)
+    await _bulk_insert(session, User, [{"id": user_id, "username": "bench", "first_name": "Bench", "is_blocked": False}])
+
+    now = datetime.utcnow()
+    order_rows = [
+        {
+            "user_id": user_id,
+            "target_price": round(rng.uniform(0.5, 2.0), 2),
+            "quantity": accounts_per_order,
+            "is_2fa": index % 2 == 1,
+            "status": "completed" if index < completed_orders else "active",
+            "completed_at": now - timedelta(minutes=index) if index < completed_orders else None,
+        }
+        for index in range(completed_orders + active_orders)
+    ]
+    await _bulk_insert(session, Order, order_rows)
+
+    completed_ids = list((await session.execute(
+        select(Order.id).where(Order.user_id == user_id, Order.status == "completed").order_by(Order.id)
+    )).scalars().all())
+
+    purchase_rows = [
+        {
+            "order_id": order_id,
+            "pack_id": f"bench-{seed}-{order_id}",
+            "accounts_count": accounts_per_order,
+            "price_paid": 1.0,
+            "total_price": float(accounts_per_order),
+            "is_2fa": order_id % 2 == 0,
+        }
+        for order_id in completed_ids
+    ]
+    await _bulk_insert(session, Purchase, purchase_rows)
+
+    purchase_ids = (await session.execute(
+        select(Purchase.id).where(Purchase.order_id.in_(completed_ids)).order_by(Purchase.id)
+    )).scalars().all()
+    account_rows = []
+    for purchase_id in purchase_ids:
+        for index in range(accounts_per_order):
+            account_rows.append({"purchase_id": purchase_id, **fake_account(index, field_size)})
+            if len(account_rows) >= CHUNK_SIZE:
+                await _bulk_insert(session, Account, account_rows)
+                account_rows = []
+    await _bulk_insert(session, Account, account_rows)
+    return completed_ids
+
+
+async def drop_user_stats(session: AsyncSession, user_id: int):
+    await session.execute(UserStats.__table__.delete().where(UserStats.user_id == user_id))
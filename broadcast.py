@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Глобальний ліміт повідомлень за секунду з можливістю паузи (flood control)"""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Відкласти всі наступні відправки (Telegram RetryAfter)"""
+        self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+@dataclass
+class BroadcastReport:
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    flood_waits: int = 0
+    blocked_user_ids: List[int] = field(default_factory=list)
+    duration: float = 0.0
+
+
+class Broadcaster:
+    """Розсилка повідомлень з обмеженою паралельністю та лімітом швидкості"""
+
+    def __init__(self, bot: Bot, rate_per_second: float, concurrency: int, max_retries: int = 3):
+        self.bot = bot
+        self.limiter = RateLimiter(rate_per_second)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+
+    async def broadcast(self, user_ids: Iterable[int], text: str, **kwargs: Any) -> BroadcastReport:
+        user_ids = list(user_ids)
+        report = BroadcastReport(total=len(user_ids))
+        queue: asyncio.Queue = asyncio.Queue()
+        for user_id in user_ids:
+            queue.put_nowait(user_id)
+
+        started = time.monotonic()
+        progress_step = max(len(user_ids) // 10, 1)
+
+        async def worker():
+            while True:
+                try:
+                    user_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self._send(user_id, text, report, **kwargs)
+                done = report.sent + report.failed
+                if done % progress_step == 0:
+                    logger.info(f"Broadcast progress: {done}/{report.total}")
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(user_ids)))]
+        await asyncio.gather(*workers)
+
+        report.duration = time.monotonic() - started
+        logger.info(
+            f"Broadcast finished in {report.duration:.1f}s: sent {report.sent}/{report.total}, "
+            f"failed {report.failed}, blocked {len(report.blocked_user_ids)}, flood waits {report.flood_waits}"
+        )
+        return report
+
+    async def _send(self, user_id: int, text: str, report: BroadcastReport, **kwargs: Any):
+        for _ in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            try:
+                await self.bot.send_message(chat_id=user_id, text=text, **kwargs)
+                report.sent += 1
+                return
+            except TelegramRetryAfter as e:
+                report.flood_waits += 1
+                logger.warning(f"Flood control, retry after {e.retry_after}s")
+                self.limiter.pause(e.retry_after)
+            except TelegramForbiddenError:
+                report.blocked_user_ids.append(user_id)
+                report.failed += 1
+                return
+            except Exception as e:
+                logger.error(f"Failed to send to user {user_id}: {str(e)}")
+                report.failed += 1
+                return
+
+        logger.error(f"Failed to send to user {user_id}: retries exhausted")
+        report.failed += 1
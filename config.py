@@ -7,16 +7,117 @@ class Settings:
     BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
     OWNER_ID: int = int(os.getenv("OWNER_ID", "0"))
     
+    # Update ingestion: polling або webhook
+    BOT_MODE: str = os.getenv("BOT_MODE", "polling")
+    WEBHOOK_URL: str = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")  # обов'язковий для BOT_MODE=webhook
+    WEBHOOK_HOST: str = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT: int = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8080")))
+    WEBHOOK_QUEUE_SIZE: int = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+    WEBHOOK_WORKERS: int = int(os.getenv("WEBHOOK_WORKERS", "8"))
+    
     # Gmail Farmer API
     API_DOMAIN: str = os.getenv("API_DOMAIN", "https://trade.gmailfarmer.com")
     API_KEY: str = os.getenv("API_KEY", "")
+    API_CONNECTOR_LIMIT: int = int(os.getenv("API_CONNECTOR_LIMIT", "20"))
+    API_CONNECTOR_LIMIT_PER_HOST: int = int(os.getenv("API_CONNECTOR_LIMIT_PER_HOST", "10"))
+    API_KEEPALIVE_SECONDS: float = float(os.getenv("API_KEEPALIVE_SECONDS", "60"))
+    API_DNS_CACHE_SECONDS: int = int(os.getenv("API_DNS_CACHE_SECONDS", "300"))
+    API_DEFAULT_TIMEOUT_SECONDS: float = float(os.getenv("API_DEFAULT_TIMEOUT_SECONDS", "30"))
+    API_PRICE_TIMEOUT_SECONDS: float = float(os.getenv("API_PRICE_TIMEOUT_SECONDS", "10"))
+    API_BALANCE_TIMEOUT_SECONDS: float = float(os.getenv("API_BALANCE_TIMEOUT_SECONDS", "10"))
+    API_BUY_TIMEOUT_SECONDS: float = float(os.getenv("API_BUY_TIMEOUT_SECONDS", "120"))
+    
+    # Order processing
+    PURCHASE_CONCURRENCY: int = int(os.getenv("PURCHASE_CONCURRENCY", "5"))
+    ORDER_CLAIM_BATCH_SIZE: int = int(os.getenv("ORDER_CLAIM_BATCH_SIZE", "20"))
+    # Оренда продовжується перед кожною покупкою і має пережити одну покупку разом зі збереженням
+    ORDER_CLAIM_LEASE_SECONDS: float = float(os.getenv("ORDER_CLAIM_LEASE_SECONDS", str(API_BUY_TIMEOUT_SECONDS * 2 + 60)))
+    
+    # UI
+    ORDERS_PAGE_SIZE: int = int(os.getenv("ORDERS_PAGE_SIZE", "10"))
+    
+    # Export
+    EXPORT_FETCH_SIZE: int = int(os.getenv("EXPORT_FETCH_SIZE", "1000"))
+    EXPORT_SPOOL_MAX_BYTES: int = int(os.getenv("EXPORT_SPOOL_MAX_BYTES", str(5 * 1024 * 1024)))
+    
+    # Price cache
+    PRICE_CACHE_TTL_SECONDS: float = float(os.getenv("PRICE_CACHE_TTL_SECONDS", "30"))
+    PRICE_CACHE_MAX_STALE_SECONDS: float = float(os.getenv("PRICE_CACHE_MAX_STALE_SECONDS", "600"))
+    
+    # Price history: сирі тіки, хвилинні та годинні свічки зберігаються обмежений час
+    PRICE_HISTORY_RAW_RETENTION_DAYS: int = int(os.getenv("PRICE_HISTORY_RAW_RETENTION_DAYS", "7"))
+    PRICE_ROLLUP_MINUTE_RETENTION_DAYS: int = int(os.getenv("PRICE_ROLLUP_MINUTE_RETENTION_DAYS", "30"))
+    PRICE_ROLLUP_HOUR_RETENTION_DAYS: int = int(os.getenv("PRICE_ROLLUP_HOUR_RETENTION_DAYS", "365"))
+    PRICE_HISTORY_MAX_POINTS: int = int(os.getenv("PRICE_HISTORY_MAX_POINTS", "200"))
+    PRICE_HISTORY_PURGE_INTERVAL_MINUTES: int = int(os.getenv("PRICE_HISTORY_PURGE_INTERVAL_MINUTES", "60"))
+    
+    # Price analytics: підказки цільової ціни з погодинної історії
+    PRICE_ANALYTICS_LOOKBACK_DAYS: int = int(os.getenv("PRICE_ANALYTICS_LOOKBACK_DAYS", "90"))
+    PRICE_ANALYTICS_REFRESH_SECONDS: float = float(os.getenv("PRICE_ANALYTICS_REFRESH_SECONDS", "300"))
+    PRICE_ANALYTICS_HORIZON_HOURS: int = int(os.getenv("PRICE_ANALYTICS_HORIZON_HOURS", "24"))
+    PRICE_ANALYTICS_MIN_SAMPLES: int = int(os.getenv("PRICE_ANALYTICS_MIN_SAMPLES", "48"))
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    DATABASE_REPLICA_URL: str = os.getenv("DATABASE_REPLICA_URL", "")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+    
+    # Access control cache
+    ACCESS_CACHE_SIZE: int = int(os.getenv("ACCESS_CACHE_SIZE", "10000"))
+    ACCESS_CACHE_TTL_SECONDS: float = float(os.getenv("ACCESS_CACHE_TTL_SECONDS", "60"))
+    
+    # FSM storage: memory, sql, redis
+    FSM_STORAGE: str = os.getenv("FSM_STORAGE", "sql")
+    FSM_REDIS_URL: str = os.getenv("FSM_REDIS_URL", "redis://localhost:6379/0")
+    FSM_STATE_TTL_SECONDS: int = int(os.getenv("FSM_STATE_TTL_SECONDS", str(24 * 60 * 60)))
     
     # Scheduler
     PRICE_CHECK_INTERVAL_MINUTES: int = int(os.getenv("PRICE_CHECK_INTERVAL_MINUTES", "5"))
     PRICE_NOTIFICATION_INTERVAL_MINUTES: int = int(os.getenv("PRICE_NOTIFICATION_INTERVAL_MINUTES", "60"))
+    
+    # Adaptive order checks: інтервал від MIN біля найближчої цілі до MAX далеко від неї
+    ORDER_CHECK_ADAPTIVE: bool = os.getenv("ORDER_CHECK_ADAPTIVE", "true").lower() == "true"
+    ORDER_CHECK_MIN_SECONDS: float = float(os.getenv("ORDER_CHECK_MIN_SECONDS", "30"))
+    ORDER_CHECK_MAX_SECONDS: float = float(os.getenv("ORDER_CHECK_MAX_SECONDS", str(PRICE_CHECK_INTERVAL_MINUTES * 60)))
+    ORDER_CHECK_NEAR_DISTANCE: float = float(os.getenv("ORDER_CHECK_NEAR_DISTANCE", "0.02"))
+    ORDER_CHECK_FAR_DISTANCE: float = float(os.getenv("ORDER_CHECK_FAR_DISTANCE", "0.2"))
+    ORDER_CHECK_JITTER: float = float(os.getenv("ORDER_CHECK_JITTER", "0.1"))
+    
+    # Notification outbox
+    OUTBOX_WORKERS: int = int(os.getenv("OUTBOX_WORKERS", "4"))
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+    OUTBOX_POLL_SECONDS: float = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+    OUTBOX_LEASE_SECONDS: float = float(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+    OUTBOX_RETRY_BASE_SECONDS: float = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "10"))
+    
+    # Broadcast
+    BROADCAST_RATE_PER_SECOND: float = float(os.getenv("BROADCAST_RATE_PER_SECOND", "25"))
+    BROADCAST_CONCURRENCY: int = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
+    BROADCAST_MAX_RETRIES: int = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+    
+    # Metrics (Prometheus): окремий сервер на METRICS_PORT в обох режимах
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_PATH: str = os.getenv("METRICS_PATH", "/metrics")
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "0.0.0.0")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    
+    # Profiling: повільні оновлення логуються з розбивкою часу, профайлер запускає власник з адмін-панелі
+    SLOW_UPDATE_SECONDS: float = float(os.getenv("SLOW_UPDATE_SECONDS", "1.0"))
+    PROFILER_INTERVAL_MS: float = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+    PROFILER_MAX_SECONDS: int = int(os.getenv("PROFILER_MAX_SECONDS", "120"))
+    
+    # Tick flight recorder: останні тіки в пам'яті; TICK_RECORDER_PERSIST - ще й у таблиці tick_log
+    TICK_RECORDER_SIZE: int = int(os.getenv("TICK_RECORDER_SIZE", "50"))
+    TICK_RECORDER_PERSIST: bool = os.getenv("TICK_RECORDER_PERSIST", "false").lower() == "true"
 
 
 settings = Settings()
@@ -1,13 +1,83 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import os
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from typing import Any, Dict, Optional
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from config import settings
-from models import Base
 
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+ALEMBIC_INI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+def _create_engine(url: str) -> AsyncEngine:
+    """Двигун з налаштуваннями пулу з config.Settings"""
+    options: Dict[str, Any] = {"echo": False}
+    parsed_url = make_url(url)
+    
+    if parsed_url.get_backend_name() != "sqlite":
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+    
+    if parsed_url.get_driver_name() == "asyncpg":
+        # Кеш підготовлених запитів SQLAlchemy та власний кеш asyncpg
+        options["connect_args"] = {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+        parsed_url = parsed_url.update_query_dict(
+            {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+        )
+    
+    return create_async_engine(parsed_url, **options)
+
+
+engine = _create_engine(settings.DATABASE_URL)
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Репліка для екранів лише для читання; без DATABASE_REPLICA_URL - основна БД
+read_engine = _create_engine(settings.DATABASE_REPLICA_URL) if settings.DATABASE_REPLICA_URL else engine
+async_read_session_maker = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class LazySession:
+    """Проксі AsyncSession: сесія створюється лише при першому зверненні"""
+    
+    def __init__(self, session_maker: async_sessionmaker):
+        self._session_maker = session_maker
+        self._session: Optional[AsyncSession] = None
+    
+    @property
+    def used(self) -> bool:
+        return self._session is not None
+    
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = self._session_maker()
+        return getattr(self._session, name)
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+def _expected_revisions() -> set:
+    script = ScriptDirectory.from_config(Config(ALEMBIC_INI_PATH))
+    return set(script.get_heads())
+
 
 async def init_db():
-    """Ініціалізація бази даних"""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+    """Перевірка, що схема бази даних відповідає останній міграції"""
+    async with engine.connect() as conn:
+        current = await conn.run_sync(
+            lambda sync_conn: set(MigrationContext.configure(sync_conn).get_current_heads())
+        )
+    
+    expected = _expected_revisions()
+    if current != expected:
+        raise RuntimeError(
+            f"Database schema version {sorted(current) or 'none'} does not match {sorted(expected)}. "
+            f"Run 'alembic upgrade head' before starting the bot."
+        )
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import IO, AsyncGenerator, List, Optional, Sequence
+
+from aiogram import Bot
+from aiogram.types import InputFile
+from aiogram.types.input_file import DEFAULT_CHUNK_SIZE
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models import Account, Order, Purchase
+
+EXPORT_FORMATS = ("txt", "csv", "json")
+
+EXPORT_COLUMNS = (
+    "email", "password", "recovery_email", "recovery_email_messages_url",
+    "authenticator_token_2fa", "app_password", "messages_url", "order_id"
+)
+
+
+class SpooledInputFile(InputFile):
+    """Файл для Telegram, що читається частинами з тимчасового буфера"""
+
+    def __init__(self, file: IO[bytes], filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+
+
+@dataclass
+class AccountExport:
+    file: IO[bytes]
+    filename: str
+    count: int
+
+    def as_input_file(self) -> SpooledInputFile:
+        return SpooledInputFile(self.file, filename=self.filename)
+
+    def close(self):
+        self.file.close()
+
+
+def _header(fmt: str) -> str:
+    if fmt == "csv":
+        return _csv_rows([EXPORT_COLUMNS])
+    if fmt == "json":
+        return "["
+    return ""
+
+
+def _footer(fmt: str, count: int) -> str:
+    if fmt == "json":
+        return "\n]\n" if count else "]\n"
+    return ""
+
+
+def _csv_rows(rows: Sequence[Sequence]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def _format_rows(fmt: str, rows: Sequence, written: int) -> str:
+    if fmt == "csv":
+        return _csv_rows(rows)
+    if fmt == "json":
+        return "".join(
+            ("\n" if written + index == 0 else ",\n") + json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False)
+            for index, row in enumerate(rows)
+        )
+    # txt: email;password;recovery_email;recovery_messages_url
+    return "".join(f"{row[0]};{row[1]};{row[2] or ''};{row[3] or ''}\n" for row in rows)
+
+
+async def export_accounts(
+    session: AsyncSession,
+    user_id: int,
+    fmt: str = "txt",
+    compress: bool = False,
+    order_ids: Optional[List[int]] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    name: str = "accounts"
+) -> AccountExport:
+    """Потоковий експорт акаунтів користувача у тимчасовий буфер (пам'ять, далі диск)"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    query = select(
+        Account.email, Account.password, Account.recovery_email, Account.recovery_email_messages_url,
+        Account.authenticator_token_2fa, Account.app_password, Account.messages_url, Purchase.order_id
+    ).join(Purchase, Account.purchase_id == Purchase.id).join(Order, Purchase.order_id == Order.id).where(
+        Order.user_id == user_id
+    ).order_by(Account.id)
+    if order_ids:
+        query = query.where(Order.id.in_(order_ids))
+    if date_from is not None:
+        query = query.where(Purchase.purchase_date >= date_from)
+    if date_to is not None:
+        query = query.where(Purchase.purchase_date < date_to)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_BYTES)
+    archive = None
+    target: IO[bytes] = spool
+    if compress:
+        archive = zipfile.ZipFile(spool, "w", compression=zipfile.ZIP_DEFLATED)
+        target = archive.open(f"{name}.{fmt}", "w", force_zip64=True)
+
+    count = 0
+    try:
+        try:
+            target.write(_header(fmt).encode("utf-8"))
+            # yield_per - серверний курсор на asyncpg, рядки читаються порціями
+            result = await session.stream(query.execution_options(yield_per=settings.EXPORT_FETCH_SIZE))
+            async for partition in result.partitions():
+                target.write(_format_rows(fmt, partition, count).encode("utf-8"))
+                count += len(partition)
+            target.write(_footer(fmt, count).encode("utf-8"))
+        finally:
+            if archive is not None:
+                target.close()
+                archive.close()
+    except Exception:
+        spool.close()
+        raise
+
+    filename = f"{name}.zip" if compress else f"{name}.{fmt}"
+    return AccountExport(file=spool, filename=filename, count=count)
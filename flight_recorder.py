@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import socket
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config import settings
+from database import async_session_maker
+from models import TickLog
+
+logger = logging.getLogger(__name__)
+
+PROCESS_NAME = f"{socket.gethostname()}:{os.getpid()}"
+
+SKIP_INSUFFICIENT_BALANCE = "недостатньо балансу"
+SKIP_CLAIM_LOST = "оренда сплила до покупки"
+
+
+@dataclass
+class TickPhase:
+    name: str
+    offset: float
+    duration: float
+    error: Optional[str] = None
+
+
+@dataclass
+class TickRecord:
+    """Що відбувалось за один тік: фази з часом, ціни, баланс і доля кожного взятого ордера"""
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    process: str = PROCESS_NAME
+    duration: Optional[float] = None
+    prices: Dict[str, float] = field(default_factory=dict)
+    balance: Optional[float] = None
+    phases: List[TickPhase] = field(default_factory=list)
+    considered: int = 0
+    filled: List[int] = field(default_factory=list)
+    skipped: Dict[int, str] = field(default_factory=dict)
+    nearest_distance: Optional[float] = None
+    error: Optional[str] = None
+    clock: float = field(default_factory=time.perf_counter, repr=False)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Заміряти фазу; фази покупок перетинаються, тому зберігається і зсув від початку тіку"""
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            self.phases.append(TickPhase(name, started - self.clock, time.perf_counter() - started, error))
+
+    def skip(self, order_id: int, reason: str):
+        self.skipped[order_id] = reason
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.clock
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("clock")
+        data["started_at"] = self.started_at.isoformat()
+        data["skipped"] = {str(order_id): reason for order_id, reason in self.skipped.items()}
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TickRecord":
+        return cls(
+            started_at=datetime.fromisoformat(data["started_at"]),
+            process=data.get("process", ""),
+            duration=data.get("duration"),
+            prices=data.get("prices", {}),
+            balance=data.get("balance"),
+            phases=[TickPhase(**phase) for phase in data.get("phases", [])],
+            considered=data.get("considered", 0),
+            filled=data.get("filled", []),
+            skipped={int(order_id): reason for order_id, reason in data.get("skipped", {}).items()},
+            nearest_distance=data.get("nearest_distance"),
+            error=data.get("error")
+        )
+
+
+class FlightRecorder:
+    """Кільцевий буфер останніх тіків; з persist=True записи зберігаються в tick_log і видні всім процесам"""
+
+    def __init__(self, session_maker: async_sessionmaker, size: int, persist: bool):
+        self.session_maker = session_maker
+        self.size = size
+        self.persist = persist
+        self.records: Deque[TickRecord] = deque(maxlen=size)
+
+    async def add(self, record: TickRecord):
+        self.records.append(record)
+        if not self.persist:
+            return
+        try:
+            await self._persist(record)
+        except Exception as e:
+            # Самописець не повинен ламати обробку ордерів
+            logger.warning(f"Failed to persist tick record: {str(e)}")
+
+    async def _persist(self, record: TickRecord):
+        async with self.session_maker() as session:
+            entry = TickLog(started_at=record.started_at, payload=json.dumps(record.as_dict(), ensure_ascii=False))
+            session.add(entry)
+            await session.flush()
+            await session.execute(delete(TickLog).where(TickLog.id <= entry.id - self.size))
+            await session.commit()
+
+    async def recent(self, limit: int) -> List[TickRecord]:
+        """Останні тіки, від найновішого"""
+        if not self.persist:
+            return list(self.records)[::-1][:limit]
+
+        async with self.session_maker() as session:
+            result = await session.execute(select(TickLog.payload).order_by(TickLog.id.desc()).limit(limit))
+            return [TickRecord.from_dict(json.loads(payload)) for payload in result.scalars().all()]
+
+
+flight_recorder = FlightRecorder(
+    async_session_maker,
+    size=settings.TICK_RECORDER_SIZE,
+    persist=settings.TICK_RECORDER_PERSIST
+)
@@ -0,0 +1,126 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from models import FsmState
+
+logger = logging.getLogger(__name__)
+
+EMPTY_DATA = "{}"
+
+
+def _dumps(data: Dict[str, Any]) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+class SQLAlchemyStorage(BaseStorage):
+    """FSM сховище в основній БД, спільне для всіх процесів бота"""
+
+    def __init__(self, session_maker: async_sessionmaker, ttl_seconds: int):
+        self.session_maker = session_maker
+        self.ttl = timedelta(seconds=ttl_seconds)
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - self.ttl
+
+    async def _load(self, key: StorageKey) -> Optional[FsmState]:
+        async with self.session_maker() as session:
+            query = select(FsmState).where(
+                FsmState.key == self._key(key),
+                FsmState.updated_at >= self._cutoff()
+            )
+            return await session.scalar(query)
+
+    async def _write(self, key: StorageKey, **values: Any):
+        """Upsert одного поля; друге поле скидається, якщо запис уже прострочений"""
+        storage_key = self._key(key)
+        expired = FsmState.updated_at < self._cutoff()
+        changes = dict(values)
+        if "state" not in values:
+            changes["state"] = case((expired, None), else_=FsmState.state)
+        if "data" not in values:
+            changes["data"] = case((expired, EMPTY_DATA), else_=FsmState.data)
+        changes["updated_at"] = datetime.utcnow()
+
+        async with self.session_maker() as session:
+            await self._upsert(session, storage_key, values, changes)
+            await session.execute(
+                delete(FsmState).where(
+                    FsmState.key == storage_key,
+                    FsmState.state.is_(None),
+                    FsmState.data == EMPTY_DATA
+                )
+            )
+            await session.commit()
+
+    async def _upsert(self, session: AsyncSession, storage_key: str, values: Dict[str, Any], changes: Dict[str, Any]):
+        new_row = {"key": storage_key, "state": None, "data": EMPTY_DATA, **values, "updated_at": changes["updated_at"]}
+        dialect = session.get_bind().dialect.name
+
+        if dialect in ("postgresql", "sqlite"):
+            insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            stmt = insert(FsmState).values(**new_row).on_conflict_do_update(
+                index_elements=[FsmState.key], set_=changes
+            )
+            await session.execute(stmt)
+            return
+
+        result = await session.execute(update(FsmState).where(FsmState.key == storage_key).values(**changes))
+        if result.rowcount == 0:
+            session.add(FsmState(**new_row))
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._write(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._load(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._write(key, data=_dumps(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._load(key)
+        return json.loads(record.data) if record else {}
+
+    async def purge_expired(self):
+        """Видалити покинуті сценарії"""
+        async with self.session_maker() as session:
+            result = await session.execute(delete(FsmState).where(FsmState.updated_at < self._cutoff()))
+            await session.commit()
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} expired FSM states")
+
+    async def close(self) -> None:
+        pass
+
+
+def create_fsm_storage(session_maker: async_sessionmaker) -> BaseStorage:
+    """Сховище FSM за налаштуванням FSM_STORAGE: memory, sql або redis"""
+    if settings.FSM_STORAGE == "memory":
+        return MemoryStorage()
+
+    if settings.FSM_STORAGE == "redis":
+        # redis - опціональна залежність, потрібна лише для цього режиму
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(
+            settings.FSM_REDIS_URL,
+            state_ttl=settings.FSM_STATE_TTL_SECONDS,
+            data_ttl=settings.FSM_STATE_TTL_SECONDS,
+            json_dumps=_dumps
+        )
+
+    return SQLAlchemyStorage(session_maker, ttl_seconds=settings.FSM_STATE_TTL_SECONDS)
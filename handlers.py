@@ -1,17 +1,29 @@
-from aiogram import Router, F
-from aiogram.filters import CommandStart
-from aiogram.types import Message, CallbackQuery, BufferedInputFile
+from aiogram import Bot, Router, F
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject, CommandStart
+from aiogram.types import BufferedInputFile, Message, CallbackQuery, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from sqlalchemy import select, func as sql_func
+from sqlalchemy import literal, or_, select, tuple_, update
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from models import User, Order, Purchase, Account
-from keyboards import main_keyboard, order_card_buttons, main_menu, order_type_selection, confirm_order, orders_navigation, orders_filter_buttons, back_to_menu, admin_panel
+from sqlalchemy.orm import aliased
+from models import User, Order
+from keyboards import main_keyboard, order_card_buttons, main_menu, prices_buttons, price_history_buttons, order_type_selection, confirm_order, orders_filter_buttons, orders_page_buttons, back_to_menu, admin_panel, profiler_durations, tick_log_buttons
 from api_client import api_client
-from order_processor import order_processor
+from price_cache import price_cache, PriceSnapshot
+from price_analytics import price_analytics, PriceInsights
+from price_history import PriceSeries, get_price_history
+from stats import apply_stats_delta, get_user_stats
+from exporter import EXPORT_FORMATS, export_accounts
+from access import user_access_cache
+from profiling import ProfileResult, profiler
+from flight_recorder import TickRecord, flight_recorder
 from config import settings
-from datetime import datetime
-from io import BytesIO
+from collections import defaultdict
+from datetime import datetime, timedelta
+from html import escape
+from typing import Dict, List, Optional, Tuple
 
 router = Router()
 
@@ -29,6 +41,123 @@ class AdminStates(StatesGroup):
     waiting_for_user_id_to_remove = State()
 
 
+# ============ HELPERS ============
+def _format_prices(snapshot: PriceSnapshot) -> str:
+    text = (
+        f"📊 <b>Поточні ціни на акаунти</b>\n\n"
+        f"Без 2FA: <b>${snapshot.no_2fa:.2f}</b>\n"
+        f"З 2FA: <b>${snapshot.with_2fa:.2f}</b>\n\n"
+        f"🕐 Оновлено: {snapshot.fetched_at.strftime('%d.%m.%Y %H:%M:%S')}"
+    )
+    if snapshot.is_stale:
+        text += "\n⚠️ API тимчасово недоступне, показано останні відомі ціни"
+    return text
+
+
+def _format_insights(insights: PriceInsights) -> str:
+    text = (
+        f"📈 <b>Історія цін</b>\n"
+        f"Медіана: ${insights.percentiles[50]:.2f} "
+        f"(10–90%: ${insights.percentiles[10]:.2f}–${insights.percentiles[90]:.2f})\n"
+        f"За 24 год: мін ${insights.rolling_min:.2f}, середня ${insights.rolling_mean:.2f}\n"
+        f"Волатильність: {insights.volatility * 100:.1f}% за день\n"
+    )
+    if insights.suggestions:
+        text += f"\n💡 <b>Рекомендовані цілі</b> (шанс виконання за {insights.horizon_hours} год):\n"
+        text += "".join(
+            f"• ${suggestion.price:.2f} — {suggestion.probability * 100:.0f}%\n"
+            for suggestion in insights.suggestions
+        )
+    return text
+
+
+SPARKLINE_BARS = "▁▂▃▄▅▆▇█"
+SPARKLINE_WIDTH = 24
+
+
+def _sparkline(values: List[float]) -> str:
+    """Мініграфік з символів-стовпчиків; довгий ряд усереднюється до SPARKLINE_WIDTH точок"""
+    if len(values) > SPARKLINE_WIDTH:
+        step = len(values) / SPARKLINE_WIDTH
+        values = [
+            sum(chunk) / len(chunk)
+            for chunk in (values[int(i * step):int((i + 1) * step)] for i in range(SPARKLINE_WIDTH))
+            if chunk
+        ]
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARKLINE_BARS[0] * len(values)
+    return "".join(SPARKLINE_BARS[round((value - low) / (high - low) * (len(SPARKLINE_BARS) - 1))] for value in values)
+
+
+def _format_price_history(title: str, series: Dict[bool, PriceSeries]) -> str:
+    text = f"📈 <b>Історія цін за {title}</b>\n"
+    for is_2fa, label in ((False, "Без 2FA"), (True, "З 2FA")):
+        points = series[is_2fa].points
+        if not points:
+            text += f"\n<b>{label}</b>: немає даних\n"
+            continue
+        first, last = points[0].open, points[-1].close
+        change = (last - first) / first if first else 0.0
+        text += (
+            f"\n<b>{label}</b>: ${first:.2f} → ${last:.2f} ({change:+.1%})\n"
+            f"Мін ${min(point.low for point in points):.2f} · макс ${max(point.high for point in points):.2f}\n"
+            f"<code>{_sparkline([point.close for point in points])}</code>\n"
+        )
+    resolution = series[False].resolution
+    text += f"\n<i>Роздільність: {resolution}, точок: {max(len(item.points) for item in series.values())}</i>"
+    return text
+
+
+def _format_tick_log(ticks: List[TickRecord]) -> str:
+    """Зведення останніх тіків і розбір найновішого"""
+    text = "🛰 <b>Останні тіки ордерів</b>\n\n"
+    for tick in ticks:
+        duration = f"{tick.duration:.2f} с" if tick.duration is not None else "—"
+        text += (
+            f"<code>{tick.started_at:%H:%M:%S}</code> {duration} · взято {tick.considered} · "
+            f"✅ {len(tick.filled)} · ⏭ {len(tick.skipped)}{' ⚠️' if tick.error else ''}\n"
+        )
+    
+    last = ticks[0]
+    text += f"\n<b>Останній тік</b> (<code>{last.started_at:%d.%m %H:%M:%S}</code>, {escape(last.process)})\n"
+    if last.prices:
+        text += f"Ціни: ${last.prices['no_2fa']:.2f} / ${last.prices['2fa']:.2f} (2FA)"
+        text += f" · Баланс: ${last.balance:.2f}\n" if last.balance is not None else "\n"
+    if last.nearest_distance is not None:
+        text += f"До найближчої цілі: {last.nearest_distance:.1%}\n"
+    
+    # Покупки йдуть паралельно, тому фази одного типу об'єднуються
+    phases: Dict[str, List[float]] = {}
+    failed_phases: Dict[str, int] = defaultdict(int)
+    for phase in last.phases:
+        name = phase.name.split(" #")[0]
+        phases.setdefault(name, []).append(phase.duration)
+        if phase.error:
+            failed_phases[name] += 1
+    if phases:
+        text += "\n<b>Фази:</b>\n"
+        for name, durations in phases.items():
+            count = f" ×{len(durations)}" if len(durations) > 1 else ""
+            slowest = f" (макс {max(durations):.3f} с)" if len(durations) > 1 else ""
+            failed = f" ❌ {failed_phases[name]}" if failed_phases[name] else ""
+            text += f"• {name}{count} — {sum(durations):.3f} с{slowest}{failed}\n"
+    
+    if last.skipped:
+        reasons: Dict[str, List[int]] = {}
+        for order_id, reason in last.skipped.items():
+            reasons.setdefault(reason, []).append(order_id)
+        text += "\n<b>Пропущено:</b>\n"
+        for reason, order_ids in list(reasons.items())[:5]:
+            shown = ", ".join(f"#{order_id}" for order_id in order_ids[:5])
+            more = f" і ще {len(order_ids) - 5}" if len(order_ids) > 5 else ""
+            text += f"• {escape(reason[:200])} — {len(order_ids)} ({shown}{more})\n"
+    
+    if last.error:
+        text += f"\n❗ <b>Помилка:</b> {escape(last.error[:500])}\n"
+    return text
+
+
 # ============ START & MENU ============
 @router.message(CommandStart())
 async def cmd_start(message: Message, session: AsyncSession):
@@ -50,11 +179,17 @@ async def cmd_start(message: Message, session: AsyncSession):
         user = User(id=user_id, username=message.from_user.username, first_name=message.from_user.first_name)
         session.add(user)
         await session.commit()
+        user_access_cache.invalidate(user_id)
     
     if user.is_blocked:
         await message.answer("🚫 <b>Доступ заборонено</b>\n\nВаш обліковий запис заблокований.", parse_mode="HTML")
         return
     
+    if user.bot_blocked_at is not None:
+        # Кеш доступу в іншому процесі міг пропустити позначку - /start після розблокування знімає її напевно
+        user.bot_blocked_at = None
+        await session.commit()
+    
     is_owner = user_id == settings.OWNER_ID
     
     await message.answer(
@@ -66,7 +201,7 @@ async def cmd_start(message: Message, session: AsyncSession):
     )
 
 
-@router.callback_query(F.data == "main_menu")
+@router.callback_query(F.data == "main_menu", flags={"db": False})
 async def show_main_menu(callback: CallbackQuery):
     is_owner = callback.from_user.id == settings.OWNER_ID
     await callback.message.edit_text(
@@ -77,17 +212,12 @@ async def show_main_menu(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data == "show_prices")
+@router.callback_query(F.data == "show_prices", flags={"db": False})
 async def show_current_prices(callback: CallbackQuery):
     try:
-        prices = await order_processor.get_current_prices()
-        text = (
-            f"📊 <b>Поточні ціни на акаунти</b>\n\n"
-            f"Без 2FA: <b>${prices['no_2fa']:.2f}</b>\n"
-            f"З 2FA: <b>${prices['2fa']:.2f}</b>\n\n"
-            f"🕐 Оновлено: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
-        )
-        await callback.message.edit_text(text, reply_markup=back_to_menu(), parse_mode="HTML")
+        snapshot = await price_cache.get_snapshot()
+        text = _format_prices(snapshot)
+        await callback.message.edit_text(text, reply_markup=prices_buttons(), parse_mode="HTML")
     except Exception as e:
         await callback.message.edit_text(
             f"❌ <b>Помилка отримання цін</b>\n\nДеталі: {str(e)}",
@@ -96,7 +226,37 @@ async def show_current_prices(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data == "show_balance")
+PRICE_HISTORY_RANGES = {
+    "1d": (timedelta(days=1), "24 год"),
+    "7d": (timedelta(days=7), "7 днів"),
+    "30d": (timedelta(days=30), "30 днів"),
+    "365d": (timedelta(days=365), "рік"),
+}
+
+
+@router.callback_query(F.data.startswith("price_history:"), flags={"db": "read"})
+async def show_price_history(callback: CallbackQuery, session: AsyncSession):
+    range_key = callback.data.split(":")[1]
+    if range_key not in PRICE_HISTORY_RANGES:
+        range_key = "1d"
+    span, title = PRICE_HISTORY_RANGES[range_key]
+    
+    start = datetime.utcnow() - span
+    series = {is_2fa: await get_price_history(session, is_2fa, start) for is_2fa in (False, True)}
+    
+    try:
+        await callback.message.edit_text(
+            _format_price_history(title, series),
+            reply_markup=price_history_buttons({key: label for key, (_, label) in PRICE_HISTORY_RANGES.items()}, range_key),
+            parse_mode="HTML"
+        )
+    except TelegramBadRequest:
+        # Той самий проміжок без нових даних: Telegram відхиляє незмінений текст
+        pass
+    await callback.answer()
+
+
+@router.callback_query(F.data == "show_balance", flags={"db": False})
 async def show_balance(callback: CallbackQuery):
     try:
         balance = await api_client.get_balance()
@@ -115,23 +275,18 @@ async def show_balance(callback: CallbackQuery):
 
 
 # ============ TEXT BUTTON HANDLERS ============
-@router.message(F.text == "📊 Ціни")
+@router.message(F.text == "📊 Ціни", flags={"db": False})
 async def handle_prices_button(message: Message):
     try:
-        prices = await order_processor.get_current_prices()
-        text = (
-            f"📊 <b>Поточні ціни на акаунти</b>\n\n"
-            f"Без 2FA: <b>${prices['no_2fa']:.2f}</b>\n"
-            f"З 2FA: <b>${prices['2fa']:.2f}</b>\n\n"
-            f"🕐 Оновлено: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
-        )
-        await message.answer(text, parse_mode="HTML")
+        snapshot = await price_cache.get_snapshot()
+        text = _format_prices(snapshot)
+        await message.answer(text, reply_markup=prices_buttons(), parse_mode="HTML")
     except Exception as e:
         await message.answer(f"❌ <b>Помилка отримання цін</b>\n\nДеталі: {str(e)}", parse_mode="HTML")
 
 
-@router.message(F.text == "📝 Ордери")
-async def handle_orders_button(message: Message, session: AsyncSession):
+@router.message(F.text == "📝 Ордери", flags={"db": False})
+async def handle_orders_button(message: Message):
     """Показати меню вибору типу ордерів"""
     await message.answer(
         "📝 <b>Мої ордери</b>\n\nОберіть тип ордерів:",
@@ -140,90 +295,29 @@ async def handle_orders_button(message: Message, session: AsyncSession):
     )
 
 
-@router.callback_query(F.data.startswith("filter_orders:"))
+@router.callback_query(F.data.startswith("filter_orders:"), flags={"db": "read"})
 async def filter_orders_handler(callback: CallbackQuery, session: AsyncSession):
     """Фільтрація ордерів за статусом"""
     filter_type = callback.data.split(":")[1]
-    user_id = callback.from_user.id
-    
-    # Визначити статус для фільтрації
-    if filter_type == "active":
-        status = "active"
-        title = "🟢 Активні ордери"
-    else:  # completed
-        status = "completed"
-        title = "✅ Виконані ордери"
-    
-    # Отримати ордери
-    query = select(Order).where(
-        Order.user_id == user_id,
-        Order.status == status
-    ).order_by(Order.created_at.desc())
-    result = await session.execute(query)
-    orders = result.scalars().all()
-    
-    if not orders:
-        await callback.message.edit_text(
-            f"{title}\n\nНемає ордерів.",
-            reply_markup=orders_filter_buttons(),
-            parse_mode="HTML"
-        )
-        await callback.answer()
-        return
     
-    # Видалити попереднє повідомлення
-    await callback.message.delete()
-    
-    # Отримати поточні ціни
-    try:
-        prices = await order_processor.get_current_prices()
-    except:
-        prices = {'no_2fa': 0, '2fa': 0}
-    
-    # Відправити кожен ордер окремим повідомленням
-    for order in orders:
-        type_text = "З 2FA" if order.is_2fa else "Без 2FA"
-        max_cost = order.target_price * order.quantity
-        
-        if status == "active":
-            current_price = prices['2fa'] if order.is_2fa else prices['no_2fa']
-            status_icon = "🟢" if current_price <= order.target_price else "🔴"
-            
-            text = (
-                f"{status_icon} <b>Ордер #{order.id}</b> - Активний\n\n"
-                f"Тип: <b>{type_text}</b>\n"
-                f"Цільова ціна: <b>${order.target_price:.2f}</b>\n"
-                f"Кількість: <b>{order.quantity}</b> шт\n"
-                f"Макс. сума: <b>${max_cost:.2f}</b>\n\n"
-                f"Поточна ціна: <b>${current_price:.2f}</b>\n"
-                f"Створено: {order.created_at.strftime('%d.%m.%Y %H:%M')}"
-            )
-            
-            await callback.message.answer(
-                text,
-                reply_markup=order_card_buttons(order.id, has_accounts=False),
-                parse_mode="HTML"
-            )
-        else:  # completed
-            text = (
-                f"✅ <b>Ордер #{order.id}</b> - Виконано\n\n"
-                f"Тип: <b>{type_text}</b>\n"
-                f"Куплено: <b>{order.quantity}</b> шт\n"
-                f"Ціна: <b>${order.target_price:.2f}</b> за шт\n"
-                f"Загальна сума: <b>${max_cost:.2f}</b>\n\n"
-                f"Виконано: {order.completed_at.strftime('%d.%m.%Y %H:%M')}"
-            )
-            
-            await callback.message.answer(
-                text,
-                reply_markup=order_card_buttons(order.id, has_accounts=True),
-                parse_mode="HTML"
-            )
+    text, keyboard = await _render_orders_page(session, callback.from_user.id, filter_type)
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("orders_page:"), flags={"db": "read"})
+async def orders_page_handler(callback: CallbackQuery, session: AsyncSession):
+    """Перехід між сторінками списку ордерів"""
+    _, filter_type, direction, cursor_id = callback.data.split(":")
     
+    text, keyboard = await _render_orders_page(
+        session, callback.from_user.id, filter_type, direction=direction, cursor_id=int(cursor_id)
+    )
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
     await callback.answer()
 
 
-@router.message(F.text == "➕ Створити")
+@router.message(F.text == "➕ Створити", flags={"db": False})
 async def handle_create_button(message: Message, state: FSMContext):
     await state.set_state(OrderCreation.waiting_for_type)
     await message.answer(
@@ -232,7 +326,7 @@ async def handle_create_button(message: Message, state: FSMContext):
     )
 
 
-@router.message(F.text == "💰 Баланс")
+@router.message(F.text == "💰 Баланс", flags={"db": False})
 async def handle_balance_button(message: Message):
     try:
         balance = await api_client.get_balance()
@@ -246,73 +340,22 @@ async def handle_balance_button(message: Message):
         await message.answer(f"❌ <b>Помилка отримання балансу</b>\n\nДеталі: {str(e)}", parse_mode="HTML")
 
 
-@router.message(F.text == "📈 Статистика")
+@router.message(F.text == "📈 Статистика", flags={"db": "read"})
 async def handle_statistics_button(message: Message, session: AsyncSession):
     """Показати статистику користувача"""
     user_id = message.from_user.id
     
-    # Загальна кількість куплених акаунтів
-    total_accounts_query = select(sql_func.count(Account.id)).join(Purchase).join(Order).where(Order.user_id == user_id)
-    total_accounts_result = await session.execute(total_accounts_query)
-    total_accounts = total_accounts_result.scalar() or 0
-    
-    # Загальна витрачена сума
-    total_spent_query = select(sql_func.sum(Purchase.total_price)).join(Order).where(Order.user_id == user_id)
-    total_spent_result = await session.execute(total_spent_query)
-    total_spent = total_spent_result.scalar() or 0
-    
-    # Статистика по типам акаунтів
-    # Без 2FA
-    no_2fa_count_query = select(sql_func.count(Account.id)).join(Purchase).join(Order).where(
-        Order.user_id == user_id,
-        Purchase.is_2fa == False
-    )
-    no_2fa_count_result = await session.execute(no_2fa_count_query)
-    no_2fa_count = no_2fa_count_result.scalar() or 0
+    stats = await get_user_stats(session, user_id, persist=False)
     
-    no_2fa_spent_query = select(sql_func.sum(Purchase.total_price)).join(Order).where(
-        Order.user_id == user_id,
-        Purchase.is_2fa == False
-    )
-    no_2fa_spent_result = await session.execute(no_2fa_spent_query)
-    no_2fa_spent = no_2fa_spent_result.scalar() or 0
-    
-    # З 2FA
-    with_2fa_count_query = select(sql_func.count(Account.id)).join(Purchase).join(Order).where(
-        Order.user_id == user_id,
-        Purchase.is_2fa == True
-    )
-    with_2fa_count_result = await session.execute(with_2fa_count_query)
-    with_2fa_count = with_2fa_count_result.scalar() or 0
-    
-    with_2fa_spent_query = select(sql_func.sum(Purchase.total_price)).join(Order).where(
-        Order.user_id == user_id,
-        Purchase.is_2fa == True
-    )
-    with_2fa_spent_result = await session.execute(with_2fa_spent_query)
-    with_2fa_spent = with_2fa_spent_result.scalar() or 0
-    
-    # Статистика по ордерах
-    completed_orders_query = select(sql_func.count(Order.id)).where(
-        Order.user_id == user_id,
-        Order.status == "completed"
-    )
-    completed_orders_result = await session.execute(completed_orders_query)
-    completed_orders = completed_orders_result.scalar() or 0
-    
-    active_orders_query = select(sql_func.count(Order.id)).where(
-        Order.user_id == user_id,
-        Order.status == "active"
-    )
-    active_orders_result = await session.execute(active_orders_query)
-    active_orders = active_orders_result.scalar() or 0
-    
-    cancelled_orders_query = select(sql_func.count(Order.id)).where(
-        Order.user_id == user_id,
-        Order.status == "cancelled"
-    )
-    cancelled_orders_result = await session.execute(cancelled_orders_query)
-    cancelled_orders = cancelled_orders_result.scalar() or 0
+    no_2fa_count = stats.accounts_no_2fa
+    no_2fa_spent = stats.spent_no_2fa
+    with_2fa_count = stats.accounts_2fa
+    with_2fa_spent = stats.spent_2fa
+    total_accounts = no_2fa_count + with_2fa_count
+    total_spent = no_2fa_spent + with_2fa_spent
+    completed_orders = stats.orders_completed
+    active_orders = stats.orders_active
+    cancelled_orders = stats.orders_cancelled
     
     # Середня ціна за акаунт
     avg_price = total_spent / total_accounts if total_accounts > 0 else 0
@@ -337,7 +380,7 @@ async def handle_statistics_button(message: Message, session: AsyncSession):
     await message.answer(text, parse_mode="HTML")
 
 
-@router.message(F.text == "⚙️ Адмін")
+@router.message(F.text == "⚙️ Адмін", flags={"db": False})
 async def handle_admin_button(message: Message):
     if message.from_user.id != settings.OWNER_ID:
         await message.answer("🚫 У вас немає доступу до адмін-панелі")
@@ -350,7 +393,7 @@ async def handle_admin_button(message: Message):
 
 
 # ============ ORDERS ============
-@router.callback_query(F.data == "create_order")
+@router.callback_query(F.data == "create_order", flags={"db": False})
 async def start_order_creation(callback: CallbackQuery, state: FSMContext):
     await state.set_state(OrderCreation.waiting_for_type)
     await callback.message.edit_text(
@@ -360,7 +403,7 @@ async def start_order_creation(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("order_type:"))
+@router.callback_query(F.data.startswith("order_type:"), flags={"db": False})
 async def process_order_type(callback: CallbackQuery, state: FSMContext):
     order_type = callback.data.split(":")[1]
     is_2fa = order_type == "2fa"
@@ -369,16 +412,20 @@ async def process_order_type(callback: CallbackQuery, state: FSMContext):
     await state.set_state(OrderCreation.waiting_for_price)
     
     try:
-        prices = await order_processor.get_current_prices()
-        current_price = prices['2fa'] if is_2fa else prices['no_2fa']
+        snapshot = await price_cache.get_snapshot()
+        current_price = snapshot.price_for(is_2fa)
         await state.update_data(current_price=current_price)
         
         type_text = "З 2FA" if is_2fa else "Без 2FA"
+        insights = await price_analytics.get_insights(is_2fa, current_price)
+        insights_text = f"{_format_insights(insights)}\n" if insights else ""
         
         await callback.message.edit_text(
             f"📝 <b>Створення нового ордера</b>\n\n"
             f"Тип: <b>{type_text}</b>\n"
-            f"Поточна ціна: <b>${current_price:.2f}</b>\n\n"
+            f"Поточна ціна: <b>${current_price:.2f}</b> "
+            f"(на {snapshot.fetched_at.strftime('%H:%M:%S')})\n\n"
+            f"{insights_text}"
             f"2️⃣ Введіть цільову ціну в доларах (наприклад: 0.50):",
             parse_mode="HTML"
         )
@@ -390,7 +437,7 @@ async def process_order_type(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.message(OrderCreation.waiting_for_price)
+@router.message(OrderCreation.waiting_for_price, flags={"db": False})
 async def process_price(message: Message, state: FSMContext):
     try:
         price = float(message.text.replace(",", "."))
@@ -403,12 +450,20 @@ async def process_price(message: Message, state: FSMContext):
         
         data = await state.get_data()
         type_text = "З 2FA" if data['is_2fa'] else "Без 2FA"
+        probability = await price_analytics.fill_probability(data['is_2fa'], price, data['current_price'])
+        probability_text = ""
+        if probability is not None:
+            probability_text = (
+                f"Шанс виконання за {settings.PRICE_ANALYTICS_HORIZON_HOURS} год: "
+                f"<b>{probability * 100:.0f}%</b>\n"
+            )
         
         await message.answer(
             f"📝 <b>Створення нового ордера</b>\n\n"
             f"Тип: <b>{type_text}</b>\n"
             f"Цільова ціна: <b>${price:.2f}</b>\n"
-            f"Поточна ціна: <b>${data['current_price']:.2f}</b>\n\n"
+            f"Поточна ціна: <b>${data['current_price']:.2f}</b>\n"
+            f"{probability_text}\n"
             f"3️⃣ Введіть кількість акаунтів (1-3000):",
             parse_mode="HTML"
         )
@@ -416,7 +471,7 @@ async def process_price(message: Message, state: FSMContext):
         await message.answer("❌ Невірний формат. Введіть число (наприклад: 0.50):")
 
 
-@router.message(OrderCreation.waiting_for_quantity)
+@router.message(OrderCreation.waiting_for_quantity, flags={"db": False})
 async def process_quantity(message: Message, state: FSMContext):
     try:
         quantity = int(message.text)
@@ -458,6 +513,8 @@ async def confirm_order_creation(callback: CallbackQuery, state: FSMContext, ses
     )
     
     session.add(order)
+    await session.flush()
+    await apply_stats_delta(session, order.user_id, orders_active=1)
     await session.commit()
     await session.refresh(order)
     
@@ -476,25 +533,19 @@ async def confirm_order_creation(callback: CallbackQuery, state: FSMContext, ses
     await callback.answer("Ордер створено! ✅")
 
 
-@router.callback_query(F.data == "cancel_order_creation")
+@router.callback_query(F.data == "cancel_order_creation", flags={"db": False})
 async def cancel_order_creation(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await callback.message.edit_text("❌ Створення скасовано.", parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data == "my_orders")
+@router.callback_query(F.data == "my_orders", flags={"db": "read"})
 async def show_my_orders(callback: CallbackQuery, session: AsyncSession):
     await _display_orders_inline(callback, session)
 
 
-@router.callback_query(F.data == "refresh_orders")
-async def refresh_orders(callback: CallbackQuery, session: AsyncSession):
-    await _display_orders_inline(callback, session)
-    await callback.answer("Оновлено ✓")
-
-
-@router.callback_query(F.data.startswith("show_order_details:"))
+@router.callback_query(F.data.startswith("show_order_details:"), flags={"db": "read"})
 async def show_order_details_handler(callback: CallbackQuery, session: AsyncSession):
     """Показати деталі конкретного ордера"""
     order_id = int(callback.data.split(":")[1])
@@ -513,8 +564,7 @@ async def show_order_details_handler(callback: CallbackQuery, session: AsyncSess
     
     if order.status == "active":
         try:
-            prices = await order_processor.get_current_prices()
-            current_price = prices['2fa'] if order.is_2fa else prices['no_2fa']
+            current_price = (await price_cache.get_snapshot()).price_for(order.is_2fa)
         except:
             current_price = 0
         
@@ -530,112 +580,161 @@ async def show_order_details_handler(callback: CallbackQuery, session: AsyncSess
             f"Створено: {order.created_at.strftime('%d.%m.%Y %H:%M')}"
         )
         
-        await callback.message.edit_text(text, reply_markup=order_card_buttons(order.id, False), parse_mode="HTML")
-    else:  # completed
+        await callback.message.edit_text(text, reply_markup=order_card_buttons(order.id, False, back_filter="active"), parse_mode="HTML")
+    elif order.status == "completed":
+        completed_text = order.completed_at.strftime('%d.%m.%Y %H:%M') if order.completed_at else "—"
         text = (
             f"✅ <b>Ордер #{order.id}</b> - Виконано\n\n"
             f"Тип: <b>{type_text}</b>\n"
             f"Цільова ціна: <b>${order.target_price:.2f}</b>\n"
             f"Кількість: <b>{order.quantity}</b> шт\n"
             f"Загальна сума: <b>${max_cost:.2f}</b>\n\n"
-            f"Виконано: {order.completed_at.strftime('%d.%m.%Y %H:%M')}"
+            f"Виконано: {completed_text}"
         )
         
-        await callback.message.edit_text(text, reply_markup=order_card_buttons(order.id, True), parse_mode="HTML")
-    
-    await callback.answer()
-
-
-async def show_orders_list(message: Message, session: AsyncSession):
-    """Показати список ордерів через текстову команду"""
-    user_id = message.from_user.id
-    
-    # Показуємо і активні, і виконані ордери
-    query = select(Order).where(
-        Order.user_id == user_id,
-        Order.status.in_(["active", "completed"])
-    ).order_by(Order.created_at.desc())
-    result = await session.execute(query)
-    orders = result.scalars().all()
-    
-    if not orders:
-        await message.answer("📝 <b>Мої ордери</b>\n\nУ вас немає ордерів.", parse_mode="HTML")
-        return
-    
-    try:
-        prices = await order_processor.get_current_prices()
-    except:
-        prices = {'no_2fa': 0, '2fa': 0}
-    
-    for order in orders:
-        type_text = "З 2FA" if order.is_2fa else "Без 2FA"
-        current_price = prices['2fa'] if order.is_2fa else prices['no_2fa']
-        max_cost = order.target_price * order.quantity
-        
-        if order.status == "completed":
-            status_icon = "✅"
-            status_text = "Виконано"
-        else:
-            status_icon = "🟢" if current_price <= order.target_price else "🔴"
-            status_text = "Активний"
-        
+        await callback.message.edit_text(text, reply_markup=order_card_buttons(order.id, True, back_filter="completed"), parse_mode="HTML")
+    elif order.status == "store_failed":
+        # Пакет оплачено, але акаунти не збереглись - звірка вручну за failed_pack_id
         text = (
-            f"{status_icon} <b>Ордер #{order.id}</b> - {status_text}\n\n"
+            f"⚠️ <b>Ордер #{order.id}</b> - Куплено, але не збережено\n\n"
             f"Тип: <b>{type_text}</b>\n"
             f"Цільова ціна: <b>${order.target_price:.2f}</b>\n"
             f"Кількість: <b>{order.quantity}</b> шт\n"
-            f"Макс. сума: <b>${max_cost:.2f}</b>\n\n"
+            f"Pack ID: <code>{escape(order.failed_pack_id or '—')}</code>\n\n"
+            "Пакет оплачено, але акаунти не вдалося зберегти. Зверніться до адміністратора з цим Pack ID."
         )
         
-        if order.status == "completed":
-            text += f"Виконано: {order.completed_at.strftime('%d.%m.%Y %H:%M')}"
-        else:
-            text += (
-                f"Поточна ціна: <b>${current_price:.2f}</b>\n"
-                f"Створено: {order.created_at.strftime('%d.%m.%Y %H:%M')}"
-            )
+        await callback.message.edit_text(text, reply_markup=order_card_buttons(order.id, back_filter="all", can_cancel=False), parse_mode="HTML")
+    elif order.status == "cancelled":
+        text = (
+            f"❌ <b>Ордер #{order.id}</b> - Скасовано\n\n"
+            f"Тип: <b>{type_text}</b>\n"
+            f"Цільова ціна: <b>${order.target_price:.2f}</b>\n"
+            f"Кількість: <b>{order.quantity}</b> шт\n"
+            f"Створено: {order.created_at.strftime('%d.%m.%Y %H:%M')}"
+        )
         
-        has_accounts = order.status == "completed"
-        await message.answer(text, reply_markup=order_card_buttons(order.id, has_accounts), parse_mode="HTML")
+        await callback.message.edit_text(text, reply_markup=order_card_buttons(order.id, back_filter="all", can_cancel=False), parse_mode="HTML")
+    else:
+        await callback.answer("❌ Невідомий статус ордера", show_alert=True)
+        return
+    
+    await callback.answer()
 
 
-async def _display_orders_inline(callback: CallbackQuery, session: AsyncSession):
-    user_id = callback.from_user.id
-    
-    query = select(Order).where(Order.user_id == user_id, Order.status == "active").order_by(Order.created_at.desc())
-    result = await session.execute(query)
-    orders = result.scalars().all()
+ORDER_FILTERS = {
+    "active": (["active"], "🟢 Активні ордери"),
+    "completed": (["completed"], "✅ Виконані ордери"),
+    "all": (["active", "completed"], "📝 Мої ордери"),
+}
+
+
+async def _fetch_orders_page(
+    session: AsyncSession,
+    user_id: int,
+    statuses: List[str],
+    direction: str = "next",
+    cursor_id: Optional[int] = None
+) -> Tuple[List[Row], bool, bool]:
+    """Одна сторінка ордерів з keyset пагінацією по (created_at, id), від нових до старих"""
+    page_size = settings.ORDERS_PAGE_SIZE
+    query = select(
+        Order.id, Order.is_2fa, Order.status, Order.target_price, Order.quantity,
+        Order.created_at, Order.completed_at
+    ).where(Order.user_id == user_id, Order.status.in_(statuses))
+    
+    if cursor_id is None:
+        direction = "next"
+    else:
+        cursor_order = aliased(Order)
+        cursor_created_at = select(cursor_order.created_at).where(
+            cursor_order.id == cursor_id, cursor_order.user_id == user_id
+        ).scalar_subquery()
+        cursor_key = tuple_(cursor_created_at, literal(cursor_id))
+    
+    if direction == "prev":
+        query = query.where(tuple_(Order.created_at, Order.id) > cursor_key)
+        query = query.order_by(Order.created_at.asc(), Order.id.asc())
+    else:
+        if cursor_id is not None:
+            query = query.where(tuple_(Order.created_at, Order.id) < cursor_key)
+        query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    
+    result = await session.execute(query.limit(page_size + 1))
+    rows = list(result.all())
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    
+    if direction == "prev":
+        rows.reverse()
+        return rows, has_more, True
+    return rows, cursor_id is not None, has_more
+
+
+async def _render_orders_page(
+    session: AsyncSession,
+    user_id: int,
+    filter_type: str,
+    direction: str = "next",
+    cursor_id: Optional[int] = None
+) -> Tuple[str, InlineKeyboardMarkup]:
+    """Текст і клавіатура сторінки ордерів для одного повідомлення"""
+    if filter_type not in ORDER_FILTERS:
+        filter_type = "active"
+    statuses, title = ORDER_FILTERS[filter_type]
+    
+    orders, has_prev, has_next = await _fetch_orders_page(session, user_id, statuses, direction, cursor_id)
     
     if not orders:
-        await callback.message.edit_text(
-            "📝 <b>Мої ордери</b>\n\nУ вас немає активних ордерів.",
-            reply_markup=back_to_menu(), parse_mode="HTML"
-        )
-        return
+        return f"{title}\n\nНемає ордерів.", orders_filter_buttons()
     
     try:
-        prices = await order_processor.get_current_prices()
+        prices = (await price_cache.get_snapshot()).as_dict()
     except:
         prices = {'no_2fa': 0, '2fa': 0}
     
-    text = f"📝 <b>Активні ордери ({len(orders)})</b>\n\n"
+    text = f"<b>{title}</b>\n\n"
     
     for order in orders:
         type_text = "З 2FA" if order.is_2fa else "Без 2FA"
-        current_price = prices['2fa'] if order.is_2fa else prices['no_2fa']
         max_cost = order.target_price * order.quantity
-        status_icon = "🟢" if current_price <= order.target_price else "🔴"
         
-        text += (
-            f"{status_icon} <b>Ордер #{order.id}</b>\n"
-            f"Тип: {type_text}\n"
-            f"Ціна: ${order.target_price:.2f} × {order.quantity} шт\n"
-            f"Макс. сума: ${max_cost:.2f}\n"
-            f"Поточна ціна: ${current_price:.2f}\n"
-            f"Створено: {order.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-        )
+        if order.status == "active":
+            current_price = prices['2fa'] if order.is_2fa else prices['no_2fa']
+            status_icon = "🟢" if current_price <= order.target_price else "🔴"
+            text += (
+                f"{status_icon} <b>Ордер #{order.id}</b>\n"
+                f"Тип: {type_text}\n"
+                f"Ціна: ${order.target_price:.2f} × {order.quantity} шт\n"
+                f"Макс. сума: ${max_cost:.2f}\n"
+                f"Поточна ціна: ${current_price:.2f}\n"
+                f"Створено: {order.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+            )
+        else:
+            completed_text = order.completed_at.strftime('%d.%m.%Y %H:%M') if order.completed_at else "—"
+            text += (
+                f"✅ <b>Ордер #{order.id}</b>\n"
+                f"Тип: {type_text}\n"
+                f"Куплено: {order.quantity} шт × ${order.target_price:.2f}\n"
+                f"Загальна сума: ${max_cost:.2f}\n"
+                f"Виконано: {completed_text}\n\n"
+            )
     
-    await callback.message.edit_text(text, reply_markup=orders_navigation(), parse_mode="HTML")
+    text += "Натисніть на номер ордера, щоб відкрити його."
+    
+    keyboard = orders_page_buttons(filter_type, [order.id for order in orders], has_prev, has_next)
+    return text, keyboard
+
+
+async def show_orders_list(message: Message, session: AsyncSession):
+    """Показати список ордерів через текстову команду"""
+    text, keyboard = await _render_orders_page(session, message.from_user.id, "all")
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+async def _display_orders_inline(callback: CallbackQuery, session: AsyncSession):
+    text, keyboard = await _render_orders_page(session, callback.from_user.id, "active")
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
 
 
 @router.callback_query(F.data.startswith("cancel_order:"))
@@ -656,7 +755,22 @@ async def cancel_order_handler(callback: CallbackQuery, session: AsyncSession):
         await callback.answer("❌ Цей ордер вже неактивний", show_alert=True)
         return
     
-    order.status = "cancelled"
+    # Ордер, взятий в оренду обробником тіку, може бути вже куплений - скасування чекає завершення
+    result = await session.execute(
+        update(Order)
+        .where(
+            Order.id == order_id,
+            Order.status == "active",
+            or_(Order.claimed_until.is_(None), Order.claimed_until < datetime.utcnow())
+        )
+        .values(status="cancelled")
+    )
+    if result.rowcount == 0:
+        await session.rollback()
+        await callback.answer("⏳ Ордер зараз виконується, спробуйте за хвилину", show_alert=True)
+        return
+    
+    await apply_stats_delta(session, user_id, orders_active=-1, orders_cancelled=1)
     await session.commit()
     
     try:
@@ -670,57 +784,112 @@ async def cancel_order_handler(callback: CallbackQuery, session: AsyncSession):
     await callback.answer("✓ Ордер скасовано", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("download_accounts:"))
+@router.callback_query(F.data.startswith("download_accounts:"), flags={"db": "read"})
 async def download_accounts_handler(callback: CallbackQuery, session: AsyncSession):
     """Завантажити акаунти з виконаного ордера"""
-    order_id = int(callback.data.split(":")[1])
+    parts = callback.data.split(":")
+    order_id = int(parts[1])
+    export_format = parts[2] if len(parts) > 2 else "txt"
     user_id = callback.from_user.id
     
+    if export_format not in EXPORT_FORMATS + ("zip",):
+        await callback.answer("❌ Невідомий формат файлу", show_alert=True)
+        return
+    
     # Перевірити чи ордер належить користувачу
-    order_query = select(Order).where(Order.id == order_id, Order.user_id == user_id)
-    order_result = await session.execute(order_query)
-    order = order_result.scalar_one_or_none()
+    order_query = select(Order.status).where(Order.id == order_id, Order.user_id == user_id)
+    order_status = await session.scalar(order_query)
     
-    if not order:
+    if not order_status:
         await callback.answer("❌ Ордер не знайдено", show_alert=True)
         return
     
-    if order.status != "completed":
+    if order_status != "completed":
         await callback.answer("❌ Ордер ще не виконано", show_alert=True)
         return
     
-    # Отримати всі акаунти з цього ордера
-    accounts_query = select(Account).join(Purchase).where(Purchase.order_id == order_id)
-    accounts_result = await session.execute(accounts_query)
-    accounts = accounts_result.scalars().all()
+    compress = export_format == "zip"
+    export = await export_accounts(
+        session, user_id,
+        fmt="txt" if compress else export_format,
+        compress=compress,
+        order_ids=[order_id],
+        name=f"order_{order_id}_accounts"
+    )
+    
+    try:
+        if not export.count:
+            await callback.answer("❌ Акаунти не знайдено", show_alert=True)
+            return
+        
+        await callback.message.answer_document(
+            document=export.as_input_file(),
+            caption=f"📥 <b>Акаунти з ордера #{order_id}</b>\n\nКількість: {export.count} шт",
+            parse_mode="HTML"
+        )
+    finally:
+        export.close()
     
-    if not accounts:
-        await callback.answer("❌ Акаунти не знайдено", show_alert=True)
+    await callback.answer("✓ Файл відправлено")
+
+
+@router.message(Command("export"), flags={"db": "read"})
+async def export_accounts_command(message: Message, command: CommandObject, session: AsyncSession):
+    """Експорт акаунтів з усіх ордерів: /export [txt|csv|json] [zip] [днів | ДД.ММ.РРРР-ДД.ММ.РРРР]"""
+    export_format = "txt"
+    compress = False
+    date_from = None
+    date_to = None
+    
+    try:
+        for arg in (command.args or "").lower().split():
+            if arg in EXPORT_FORMATS:
+                export_format = arg
+            elif arg == "zip":
+                compress = True
+            elif arg.isdigit():
+                date_from = datetime.utcnow() - timedelta(days=int(arg))
+            elif "-" in arg:
+                start, end = arg.split("-", 1)
+                date_from = datetime.strptime(start, "%d.%m.%Y")
+                date_to = datetime.strptime(end, "%d.%m.%Y") + timedelta(days=1)
+            else:
+                raise ValueError(arg)
+    except ValueError:
+        await message.answer(
+            "❌ Невірний формат.\n\n"
+            "Приклади:\n"
+            "<code>/export csv 30</code> - CSV за 30 днів\n"
+            "<code>/export json zip 01.10.2026-15.10.2026</code> - JSON в архіві за період",
+            parse_mode="HTML"
+        )
         return
     
-    # Сформувати файл у форматі: email;password;recovery_email;recovery_messages_url
-    file_content = ""
-    for account in accounts:
-        recovery_email = account.recovery_email or ""
-        recovery_url = account.recovery_email_messages_url or ""
-        file_content += f"{account.email};{account.password};{recovery_email};{recovery_url}\n"
-    
-    # Створити файл в пам'яті
-    file_bytes = file_content.encode('utf-8')
-    file = BufferedInputFile(file_bytes, filename=f"order_{order_id}_accounts.txt")
-    
-    # Відправити файл
-    await callback.message.answer_document(
-        document=file,
-        caption=f"📥 <b>Акаунти з ордера #{order_id}</b>\n\nКількість: {len(accounts)} шт",
-        parse_mode="HTML"
+    export = await export_accounts(
+        session, message.from_user.id,
+        fmt=export_format,
+        compress=compress,
+        date_from=date_from,
+        date_to=date_to,
+        name=f"accounts_{datetime.now().strftime('%Y%m%d_%H%M')}"
     )
     
-    await callback.answer("✓ Файл відправлено")
+    try:
+        if not export.count:
+            await message.answer("❌ Акаунти не знайдено", parse_mode="HTML")
+            return
+        
+        await message.answer_document(
+            document=export.as_input_file(),
+            caption=f"📥 <b>Експорт акаунтів</b>\n\nКількість: {export.count} шт",
+            parse_mode="HTML"
+        )
+    finally:
+        export.close()
 
 
 # ============ ADMIN ============
-@router.callback_query(F.data == "admin_panel")
+@router.callback_query(F.data == "admin_panel", flags={"db": False})
 async def show_admin_panel(callback: CallbackQuery):
     if callback.from_user.id != settings.OWNER_ID:
         await callback.answer("Немає доступу", show_alert=True)
@@ -733,7 +902,7 @@ async def show_admin_panel(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_add_user")
+@router.callback_query(F.data == "admin_add_user", flags={"db": False})
 async def start_add_user(callback: CallbackQuery, state: FSMContext):
     if callback.from_user.id != settings.OWNER_ID:
         await callback.answer("Немає доступу", show_alert=True)
@@ -763,6 +932,7 @@ async def process_add_user(message: Message, state: FSMContext, session: AsyncSe
             if existing_user.is_blocked:
                 existing_user.is_blocked = False
                 await session.commit()
+                user_access_cache.invalidate(user_id)
                 await message.answer(
                     f"✅ Користувача <code>{user_id}</code> розблоковано!",
                     parse_mode="HTML"
@@ -776,6 +946,7 @@ async def process_add_user(message: Message, state: FSMContext, session: AsyncSe
             new_user = User(id=user_id)
             session.add(new_user)
             await session.commit()
+            user_access_cache.invalidate(user_id)
             
             await message.answer(
                 f"✅ Користувача <code>{user_id}</code> додано!",
@@ -787,7 +958,7 @@ async def process_add_user(message: Message, state: FSMContext, session: AsyncSe
         await message.answer("❌ Невірний формат. Введіть ID:")
 
 
-@router.callback_query(F.data == "admin_remove_user")
+@router.callback_query(F.data == "admin_remove_user", flags={"db": False})
 async def start_remove_user(callback: CallbackQuery, state: FSMContext):
     if callback.from_user.id != settings.OWNER_ID:
         await callback.answer("Немає доступу", show_alert=True)
@@ -821,6 +992,7 @@ async def process_remove_user(message: Message, state: FSMContext, session: Asyn
         if user:
             await session.delete(user)
             await session.commit()
+            user_access_cache.invalidate(user_id)
             await message.answer(
                 f"✅ Користувача <code>{user_id}</code> видалено!",
                 parse_mode="HTML"
@@ -836,7 +1008,7 @@ async def process_remove_user(message: Message, state: FSMContext, session: Asyn
         await message.answer("❌ Невірний формат. Введіть ID:")
 
 
-@router.callback_query(F.data == "admin_list_users")
+@router.callback_query(F.data == "admin_list_users", flags={"db": "read"})
 async def list_users(callback: CallbackQuery, session: AsyncSession):
     if callback.from_user.id != settings.OWNER_ID:
         await callback.answer("Немає доступу", show_alert=True)
@@ -857,6 +1029,8 @@ async def list_users(callback: CallbackQuery, session: AsyncSession):
     
     for user in users:
         status = "🚫 Заблокований" if user.is_blocked else "✅ Активний"
+        if user.bot_blocked_at is not None:
+            status += " (заблокував бота)"
         owner_badge = " 👑" if user.id == settings.OWNER_ID else ""
         username_text = f"@{user.username}" if user.username else "—"
         name_text = user.first_name if user.first_name else "—"
@@ -870,3 +1044,71 @@ async def list_users(callback: CallbackQuery, session: AsyncSession):
     
     await callback.message.edit_text(text, reply_markup=back_to_menu(), parse_mode="HTML")
     await callback.answer()
+
+
+PROFILER_DURATIONS = [10, 30, 60]
+
+
+@router.callback_query(F.data == "admin_profiler", flags={"db": False})
+async def show_profiler_menu(callback: CallbackQuery):
+    if callback.from_user.id != settings.OWNER_ID:
+        await callback.answer("Немає доступу", show_alert=True)
+        return
+    
+    status = "⏳ Зараз триває профілювання" if profiler.running else "Оберіть тривалість:"
+    await callback.message.edit_text(
+        "🔬 <b>Профайлер</b>\n\n"
+        "Семплює цикл подій бота і надсилає звіт файлом: найгарячіші функції, "
+        "час хендлерів (БД / API / Telegram) і згорнуті стеки для flamegraph.\n\n"
+        f"{status}",
+        reply_markup=profiler_durations([seconds for seconds in PROFILER_DURATIONS if seconds <= settings.PROFILER_MAX_SECONDS]),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("admin_profile:"), flags={"db": False})
+async def start_profiler(callback: CallbackQuery, bot: Bot):
+    if callback.from_user.id != settings.OWNER_ID:
+        await callback.answer("Немає доступу", show_alert=True)
+        return
+    
+    seconds = min(int(callback.data.split(":")[1]), settings.PROFILER_MAX_SECONDS)
+    chat_id = callback.from_user.id
+    
+    async def send_report(result: ProfileResult):
+        await bot.send_document(
+            chat_id,
+            document=BufferedInputFile(result.render().encode(), filename=f"profile_{result.started_at:%Y%m%d_%H%M%S}.txt"),
+            caption=f"🔬 Профіль за {result.duration:.0f} с ({result.samples} семплів)"
+        )
+    
+    if not profiler.start(seconds, send_report):
+        await callback.answer("⏳ Профілювання вже триває", show_alert=True)
+        return
+    
+    await callback.answer(f"🔬 Профілювання на {seconds} с запущено")
+    await callback.message.edit_text(
+        f"🔬 <b>Профілювання запущено на {seconds} с</b>\n\nЗвіт прийде окремим файлом.",
+        reply_markup=admin_panel(), parse_mode="HTML"
+    )
+
+
+@router.callback_query(F.data == "admin_ticks", flags={"db": False})
+async def show_tick_log(callback: CallbackQuery):
+    if callback.from_user.id != settings.OWNER_ID:
+        await callback.answer("Немає доступу", show_alert=True)
+        return
+    
+    ticks = await flight_recorder.recent(10)
+    if not ticks:
+        text = "🛰 <b>Останні тіки ордерів</b>\n\nЩе не було жодного тіку."
+    else:
+        text = _format_tick_log(ticks)
+    
+    try:
+        await callback.message.edit_text(text, reply_markup=tick_log_buttons(), parse_mode="HTML")
+    except TelegramBadRequest:
+        # Повторне оновлення без нових тіків: Telegram відхиляє незмінений текст
+        pass
+    await callback.answer()
@@ -1,5 +1,6 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
+from typing import Dict, List, Optional
 
 
 def main_keyboard(is_owner: bool = False) -> ReplyKeyboardMarkup:
@@ -32,6 +33,24 @@ def main_menu(is_owner: bool = False) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def prices_buttons() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="📈 Історія цін", callback_data="price_history:1d"))
+    builder.row(InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu"))
+    return builder.as_markup()
+
+
+def price_history_buttons(ranges: Dict[str, str], selected: str) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(*(
+        InlineKeyboardButton(text=f"• {label} •" if key == selected else label, callback_data=f"price_history:{key}")
+        for key, label in ranges.items()
+    ))
+    builder.row(InlineKeyboardButton(text="📊 Поточні ціни", callback_data="show_prices"))
+    builder.row(InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu"))
+    return builder.as_markup()
+
+
 def order_type_selection() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -51,15 +70,28 @@ def confirm_order() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def order_card_buttons(order_id: int, has_accounts: bool = False) -> InlineKeyboardMarkup:
+def order_card_buttons(
+    order_id: int,
+    has_accounts: bool = False,
+    back_filter: Optional[str] = None,
+    can_cancel: bool = True
+) -> InlineKeyboardMarkup:
     """Кнопки для конкретного ордера"""
     builder = InlineKeyboardBuilder()
     
     if has_accounts:
         builder.row(InlineKeyboardButton(text="📥 Завантажити акаунти", callback_data=f"download_accounts:{order_id}"))
-    else:
+        builder.row(
+            InlineKeyboardButton(text="CSV", callback_data=f"download_accounts:{order_id}:csv"),
+            InlineKeyboardButton(text="JSON", callback_data=f"download_accounts:{order_id}:json"),
+            InlineKeyboardButton(text="ZIP", callback_data=f"download_accounts:{order_id}:zip")
+        )
+    elif can_cancel:
         builder.row(InlineKeyboardButton(text="❌ Скасувати", callback_data=f"cancel_order:{order_id}"))
     
+    if back_filter:
+        builder.row(InlineKeyboardButton(text="⬅️ До списку", callback_data=f"filter_orders:{back_filter}"))
+    
     return builder.as_markup()
 
 
@@ -74,9 +106,31 @@ def orders_filter_buttons() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def orders_navigation() -> InlineKeyboardMarkup:
+def orders_page_buttons(
+    filter_type: str,
+    order_ids: List[int],
+    has_prev: bool,
+    has_next: bool
+) -> InlineKeyboardMarkup:
+    """Сторінка ордерів: кнопки ордерів та навігація курсором (id першого/останнього ордера)"""
     builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="🔄 Оновити", callback_data="refresh_orders"))
+    for order_id in order_ids:
+        builder.button(text=f"#{order_id}", callback_data=f"show_order_details:{order_id}")
+    builder.adjust(5)
+    
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"orders_page:{filter_type}:prev:{order_ids[0]}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton(text="Далі ▶️", callback_data=f"orders_page:{filter_type}:next:{order_ids[-1]}"))
+    if navigation:
+        builder.row(*navigation)
+    
+    builder.row(
+        InlineKeyboardButton(text="🟢 Активні", callback_data="filter_orders:active"),
+        InlineKeyboardButton(text="✅ Виконані", callback_data="filter_orders:completed")
+    )
+    builder.row(InlineKeyboardButton(text="🔄 Оновити", callback_data=f"filter_orders:{filter_type}"))
     builder.row(InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu"))
     return builder.as_markup()
 
@@ -92,5 +146,24 @@ def admin_panel() -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text="➕ Додати користувача", callback_data="admin_add_user"))
     builder.row(InlineKeyboardButton(text="🗑 Видалити користувача", callback_data="admin_remove_user"))
     builder.row(InlineKeyboardButton(text="📋 Список користувачів", callback_data="admin_list_users"))
+    builder.row(InlineKeyboardButton(text="🛰 Тіки ордерів", callback_data="admin_ticks"))
+    builder.row(InlineKeyboardButton(text="🔬 Профайлер", callback_data="admin_profiler"))
     builder.row(InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu"))
     return builder.as_markup()
+
+
+def profiler_durations(durations: List[int]) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(*(
+        InlineKeyboardButton(text=f"⏱ {seconds} с", callback_data=f"admin_profile:{seconds}")
+        for seconds in durations
+    ))
+    builder.row(InlineKeyboardButton(text="⚙️ Адмін-панель", callback_data="admin_panel"))
+    return builder.as_markup()
+
+
+def tick_log_buttons() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="🔄 Оновити", callback_data="admin_ticks"))
+    builder.row(InlineKeyboardButton(text="⚙️ Адмін-панель", callback_data="admin_panel"))
+    return builder.as_markup()
@@ -1,17 +1,23 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
 from typing import Callable, Dict, Any, Awaitable
 from aiogram.types import TelegramObject
 
 from config import settings
-from database import init_db, async_session_maker
+from api_client import api_client
+from database import init_db, engine, read_engine, async_session_maker, async_read_session_maker, LazySession
 from handlers import router
 from scheduler import BotScheduler
+from fsm_storage import SQLAlchemyStorage, create_fsm_storage
+from webhook import WebhookServer
+from access import AccessMiddleware
+from metrics import UPDATE_DB_SESSIONS, TelegramMetricsMiddleware, instrument_engine, start_metrics_server
+from profiling import HandlerTimingMiddleware
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,15 +27,27 @@ logger = logging.getLogger(__name__)
 
 
 class DatabaseMiddleware(BaseMiddleware):
+    """Лінива сесія БД за прапорцем хендлера: db=False - без сесії, db="read" - репліка"""
+    
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        async with async_session_maker() as session:
-            data['session'] = session
+        db_flag = get_flag(data, "db", default=True)
+        if db_flag is False:
+            UPDATE_DB_SESSIONS.labels("opted_out").inc()
+            return await handler(event, data)
+        
+        session_maker = async_read_session_maker if db_flag == "read" else async_session_maker
+        session = LazySession(session_maker)
+        data['session'] = session
+        try:
             return await handler(event, data)
+        finally:
+            await session.close()
+            UPDATE_DB_SESSIONS.labels("used" if session.used else "unused").inc()
 
 
 async def main():
@@ -37,10 +55,20 @@ async def main():
     
     bot = Bot(token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
     
-    storage = MemoryStorage()
+    storage = create_fsm_storage(async_session_maker)
     dp = Dispatcher(storage=storage)
     
-    dp.update.middleware(DatabaseMiddleware())
+    # Заміри потрібні і метрикам, і розбивці часу повільних оновлень
+    bot.session.middleware(TelegramMetricsMiddleware())
+    instrument_engine(engine, "primary")
+    if read_engine is not engine:
+        instrument_engine(read_engine, "replica")
+    
+    # Рівень хендлерів: тут доступні прапорці (flags) конкретного хендлера
+    for observer in (dp.message, dp.callback_query):
+        observer.middleware(HandlerTimingMiddleware(slow_seconds=settings.SLOW_UPDATE_SECONDS))
+        observer.middleware(AccessMiddleware())
+        observer.middleware(DatabaseMiddleware())
     
     dp.include_router(router)
     
@@ -48,18 +76,47 @@ async def main():
     await init_db()
     logger.info("Database initialized")
     
+    await api_client.start()
+    
     scheduler = BotScheduler(bot)
     scheduler.start(
         price_check_interval=settings.PRICE_CHECK_INTERVAL_MINUTES,
         notification_interval=settings.PRICE_NOTIFICATION_INTERVAL_MINUTES
     )
+    if isinstance(storage, SQLAlchemyStorage):
+        scheduler.add_job(storage.purge_expired, minutes=60, job_id="purge_fsm_states")
     
     logger.info(f"Bot started. Owner ID: {settings.OWNER_ID}")
     
+    metrics_runner = None
     try:
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        # Метрики завжди на окремому порту: публічний webhook сервер їх не віддає
+        if settings.METRICS_ENABLED and settings.METRICS_PORT:
+            metrics_runner = await start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
+        if settings.BOT_MODE == "webhook":
+            server = WebhookServer(
+                bot, dp,
+                path=settings.WEBHOOK_PATH,
+                secret=settings.WEBHOOK_SECRET,
+                queue_size=settings.WEBHOOK_QUEUE_SIZE,
+                workers=settings.WEBHOOK_WORKERS
+            )
+            await server.run(
+                host=settings.WEBHOOK_HOST,
+                port=settings.WEBHOOK_PORT,
+                webhook_url=settings.WEBHOOK_URL,
+                allowed_updates=dp.resolve_used_update_types()
+            )
+        else:
+            # Після запуску в режимі webhook Telegram відхиляє getUpdates, поки webhook не знято
+            await bot.delete_webhook()
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
         scheduler.shutdown()
+        await api_client.close()
+        await storage.close()
         await bot.session.close()
         logger.info("Bot stopped")
 
@@ -0,0 +1,163 @@
+import hmac
+import logging
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# ============ Gmail Farmer API ============
+API_REQUEST_SECONDS = Histogram(
+    "gmailfarmer_api_request_seconds", "Gmail Farmer API request latency", ["endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+API_ERRORS = Counter(
+    "gmailfarmer_api_errors_total", "Failed Gmail Farmer API requests", ["endpoint", "reason"]
+)
+
+# ============ Order ticks ============
+ORDER_TICK_SECONDS = Histogram(
+    "order_tick_seconds", "Duration of an order processing tick",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+ORDER_TICKS_MISSED = Counter("order_ticks_missed_total", "Order ticks skipped or delayed past their interval")
+ORDER_TICK_ORDERS = Histogram(
+    "order_tick_orders", "Orders per tick by outcome (claimed, filled, failed, unaffordable)", ["outcome"],
+    buckets=(0, 1, 5, 10, 20, 50, 100, 500, 1000, 5000)
+)
+ORDER_CHECK_INTERVAL_SECONDS = Gauge("order_check_interval_seconds", "Delay before the next order tick")
+ORDER_NEAREST_DISTANCE = Gauge("order_nearest_target_distance", "Relative distance from price to the nearest target")
+
+# ============ Database ============
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connections taken from the pool", ["engine"])
+DB_POOL_IN_USE = Gauge("db_pool_connections_in_use", "Connections currently checked out", ["engine"])
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds", "SQL statement execution time", ["engine"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+UPDATE_DB_SESSIONS = Counter(
+    "update_db_sessions_total", "Updates by database session use (used, unused, opted_out)", ["outcome"]
+)
+
+# ============ Telegram ============
+TELEGRAM_REQUEST_SECONDS = Histogram(
+    "telegram_request_seconds", "Telegram Bot API request latency", ["method"],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+TELEGRAM_FLOOD_WAITS = Counter("telegram_flood_waits_total", "Telegram RetryAfter responses", ["method"])
+TELEGRAM_ERRORS = Counter("telegram_errors_total", "Failed Telegram Bot API requests", ["method", "error"])
+
+# ============ Handlers ============
+UPDATE_SECONDS = Histogram(
+    "update_handler_seconds", "Update handling time per handler and callback_data prefix", ["handler", "callback"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+UPDATE_ERRORS = Counter("update_handler_errors_total", "Handler exceptions", ["handler", "callback"])
+
+# Категорії зовнішніх викликів у розбивці часу оновлення
+TIME_CATEGORIES = ("db", "api", "telegram")
+
+
+@dataclass
+class UpdateTimings:
+    """Час, витрачений поточним оновленням на БД, Gmail Farmer API і Telegram"""
+    spent: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    calls: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+
+current_timings: ContextVar[Optional[UpdateTimings]] = ContextVar("current_timings", default=None)
+
+
+def track_time(category: str, seconds: float):
+    """Додати час виклику до оновлення, яке зараз обробляється (поза хендлерами - нічого)"""
+    timings = current_timings.get()
+    if timings is not None:
+        timings.spent[category] += seconds
+        timings.calls[category] += 1
+
+
+def instrument_engine(engine: AsyncEngine, name: str):
+    """Лічильники пулу і час запитів через події SQLAlchemy"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.labels(name).inc()
+        DB_POOL_IN_USE.labels(name).inc()
+
+    @event.listens_for(sync_engine.pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_IN_USE.labels(name).dec()
+
+    # Час старту зберігається в контексті виконання: запит з помилкою не лишає сміття на з'єднанні з пулу
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        DB_QUERY_SECONDS.labels(name).observe(elapsed)
+        track_time("db", elapsed)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Час кожного запиту до Bot API, flood control і помилки"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            TELEGRAM_FLOOD_WAITS.labels(name).inc()
+            raise
+        except Exception as e:
+            TELEGRAM_ERRORS.labels(name, type(e).__name__).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            TELEGRAM_REQUEST_SECONDS.labels(name).observe(elapsed)
+            track_time("telegram", elapsed)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected.encode()):
+            return web.Response(status=401)
+    return web.Response(body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Окремий HTTP сервер для /metrics, не доступний через публічний webhook"""
+    app = web.Application()
+    app.router.add_get(settings.METRICS_PATH, handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info(f"Metrics server listening on {host}:{port}{settings.METRICS_PATH}")
+    return runner
@@ -0,0 +1,75 @@
+"""initial schema
+
+Revision ID: 0001_initial
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_initial"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("username", sa.String(255), nullable=True),
+        sa.Column("first_name", sa.String(255), nullable=True),
+        sa.Column("is_blocked", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_table(
+        "orders",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("target_price", sa.Float(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("is_2fa", sa.Boolean(), nullable=False),
+        sa.Column("status", sa.String(50), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        "purchases",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("pack_id", sa.String(255), nullable=False, unique=True),
+        sa.Column("accounts_count", sa.Integer(), nullable=False),
+        sa.Column("price_paid", sa.Float(), nullable=False),
+        sa.Column("total_price", sa.Float(), nullable=False),
+        sa.Column("is_2fa", sa.Boolean(), nullable=False),
+        sa.Column("purchase_date", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_table(
+        "accounts",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("purchase_id", sa.Integer(), sa.ForeignKey("purchases.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("password", sa.String(255), nullable=False),
+        sa.Column("recovery_email", sa.String(255), nullable=True),
+        sa.Column("recovery_email_messages_url", sa.Text(), nullable=True),
+        sa.Column("authenticator_token_2fa", sa.String(255), nullable=True),
+        sa.Column("app_password", sa.String(255), nullable=True),
+        sa.Column("messages_url", sa.Text(), nullable=True),
+        sa.Column("status", sa.String(50), nullable=False),
+    )
+    op.create_table(
+        "price_history",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("timestamp", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("price_no_2fa", sa.Float(), nullable=False),
+        sa.Column("price_2fa", sa.Float(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("price_history")
+    op.drop_table("accounts")
+    op.drop_table("purchases")
+    op.drop_table("orders")
+    op.drop_table("users")
@@ -0,0 +1,29 @@
+"""indexes on foreign keys and hot filters
+
+Revision ID: 0002_indexes
+Revises: 0001_initial
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0002_indexes"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_orders_user_id_status_created_at", "orders", ["user_id", "status", "created_at"])
+    op.create_index("ix_orders_status_is_2fa_target_price", "orders", ["status", "is_2fa", "target_price"])
+    op.create_index("ix_purchases_order_id", "purchases", ["order_id"])
+    op.create_index("ix_accounts_purchase_id", "accounts", ["purchase_id"])
+    op.create_index("ix_price_history_timestamp", "price_history", ["timestamp"])
+
+
+def downgrade():
+    op.drop_index("ix_price_history_timestamp", table_name="price_history")
+    op.drop_index("ix_accounts_purchase_id", table_name="accounts")
+    op.drop_index("ix_purchases_order_id", table_name="purchases")
+    op.drop_index("ix_orders_status_is_2fa_target_price", table_name="orders")
+    op.drop_index("ix_orders_user_id_status_created_at", table_name="orders")
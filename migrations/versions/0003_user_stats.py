@@ -0,0 +1,68 @@
+"""per-user statistics rollup
+
+Revision ID: 0003_user_stats
+Revises: 0002_indexes
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003_user_stats"
+down_revision = "0002_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_stats",
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("accounts_no_2fa", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("accounts_2fa", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("spent_no_2fa", sa.Float(), server_default="0", nullable=False),
+        sa.Column("spent_2fa", sa.Float(), server_default="0", nullable=False),
+        sa.Column("orders_active", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("orders_completed", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("orders_cancelled", sa.Integer(), server_default="0", nullable=False),
+    )
+    
+    # Заповнення зведень для існуючих користувачів
+    op.execute(
+        """
+        INSERT INTO user_stats (
+            user_id, accounts_no_2fa, accounts_2fa, spent_no_2fa, spent_2fa,
+            orders_active, orders_completed, orders_cancelled
+        )
+        SELECT
+            u.id,
+            COALESCE(p.accounts_no_2fa, 0), COALESCE(p.accounts_2fa, 0),
+            COALESCE(p.spent_no_2fa, 0), COALESCE(p.spent_2fa, 0),
+            COALESCE(o.orders_active, 0), COALESCE(o.orders_completed, 0), COALESCE(o.orders_cancelled, 0)
+        FROM users u
+        LEFT JOIN (
+            SELECT
+                user_id,
+                SUM(CASE WHEN status = 'active' THEN 1 ELSE 0 END) AS orders_active,
+                SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) AS orders_completed,
+                SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END) AS orders_cancelled
+            FROM orders
+            GROUP BY user_id
+        ) o ON o.user_id = u.id
+        LEFT JOIN (
+            SELECT
+                orders.user_id AS user_id,
+                SUM(CASE WHEN purchases.is_2fa THEN 0 ELSE purchases.accounts_count END) AS accounts_no_2fa,
+                SUM(CASE WHEN purchases.is_2fa THEN purchases.accounts_count ELSE 0 END) AS accounts_2fa,
+                SUM(CASE WHEN purchases.is_2fa THEN 0 ELSE purchases.total_price END) AS spent_no_2fa,
+                SUM(CASE WHEN purchases.is_2fa THEN purchases.total_price ELSE 0 END) AS spent_2fa
+            FROM purchases
+            JOIN orders ON orders.id = purchases.order_id
+            GROUP BY orders.user_id
+        ) p ON p.user_id = u.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("user_stats")
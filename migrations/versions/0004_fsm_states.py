@@ -0,0 +1,30 @@
+"""shared FSM storage
+
+Revision ID: 0004_fsm_states
+Revises: 0003_user_stats
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_fsm_states"
+down_revision = "0003_user_stats"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "fsm_states",
+        sa.Column("key", sa.String(255), primary_key=True),
+        sa.Column("state", sa.String(255), nullable=True),
+        sa.Column("data", sa.Text(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_fsm_states_updated_at", "fsm_states", ["updated_at"])
+
+
+def downgrade():
+    op.drop_index("ix_fsm_states_updated_at", table_name="fsm_states")
+    op.drop_table("fsm_states")
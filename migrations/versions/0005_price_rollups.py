@@ -0,0 +1,109 @@
+"""price history rollups
+
+Revision ID: 0005_price_rollups
+Revises: 0004_fsm_states
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_price_rollups"
+down_revision = "0004_fsm_states"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+TRUNCATE = {
+    "1m": dict(second=0, microsecond=0),
+    "1h": dict(minute=0, second=0, microsecond=0),
+    "1d": dict(hour=0, minute=0, second=0, microsecond=0),
+}
+
+
+def upgrade():
+    rollups = op.create_table(
+        "price_rollups",
+        sa.Column("resolution", sa.String(8), primary_key=True),
+        sa.Column("is_2fa", sa.Boolean(), primary_key=True),
+        sa.Column("bucket_start", sa.DateTime(), primary_key=True),
+        sa.Column("open", sa.Float(), nullable=False),
+        sa.Column("high", sa.Float(), nullable=False),
+        sa.Column("low", sa.Float(), nullable=False),
+        sa.Column("close", sa.Float(), nullable=False),
+        sa.Column("samples", sa.Integer(), nullable=False),
+        sa.Column("last_at", sa.DateTime(), nullable=False),
+    )
+    _backfill(rollups)
+
+
+def _backfill(rollups):
+    """Побудувати свічки з наявної історії за один прохід по timestamp"""
+    conn = op.get_bind()
+    history = sa.table(
+        "price_history",
+        sa.column("id", sa.Integer()),
+        sa.column("timestamp", sa.DateTime()),
+        sa.column("price_no_2fa", sa.Float()),
+        sa.column("price_2fa", sa.Float()),
+    )
+    query = sa.select(
+        history.c.id, history.c.timestamp, history.c.price_no_2fa, history.c.price_2fa
+    ).where(
+        history.c.timestamp.is_not(None)
+    ).order_by(history.c.timestamp, history.c.id).limit(BATCH_SIZE)
+
+    current = {}
+    batch = []
+
+    def flush_batch():
+        if batch:
+            conn.execute(rollups.insert(), batch)
+            batch.clear()
+
+    cursor = None
+    while True:
+        page = query
+        if cursor is not None:
+            page = page.where(sa.tuple_(history.c.timestamp, history.c.id) > sa.tuple_(*cursor))
+        rows = conn.execute(page).all()
+        if not rows:
+            break
+        cursor = (rows[-1].timestamp, rows[-1].id)
+        for row in rows:
+            _aggregate(current, batch, row)
+        if len(batch) >= BATCH_SIZE:
+            flush_batch()
+
+    batch.extend(current.values())
+    flush_batch()
+
+
+def _aggregate(current, batch, row):
+    """Додати тік до відкритих свічок; закриті свічки переходять у batch"""
+    timestamp = row.timestamp
+    for is_2fa, price in ((False, row.price_no_2fa), (True, row.price_2fa)):
+        if price is None:
+            continue
+        for resolution, fields in TRUNCATE.items():
+            bucket = timestamp.replace(**fields)
+            candle = current.get((resolution, is_2fa))
+            if candle is not None and candle["bucket_start"] == bucket:
+                candle["high"] = max(candle["high"], price)
+                candle["low"] = min(candle["low"], price)
+                candle["close"] = price
+                candle["samples"] += 1
+                candle["last_at"] = timestamp
+                continue
+            if candle is not None:
+                batch.append(candle)
+            current[(resolution, is_2fa)] = {
+                "resolution": resolution, "is_2fa": is_2fa, "bucket_start": bucket,
+                "open": price, "high": price, "low": price, "close": price,
+                "samples": 1, "last_at": timestamp,
+            }
+
+
+def downgrade():
+    op.drop_table("price_rollups")
@@ -0,0 +1,37 @@
+"""notification outbox
+
+Revision ID: 0006_notification_outbox
+Revises: 0005_price_rollups
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006_notification_outbox"
+down_revision = "0005_price_rollups"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "notification_outbox",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("kind", sa.String(50), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+    )
+    op.create_index(
+        "ix_notification_outbox_status_next_attempt_at", "notification_outbox", ["status", "next_attempt_at"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_notification_outbox_status_next_attempt_at", table_name="notification_outbox")
+    op.drop_table("notification_outbox")
@@ -0,0 +1,25 @@
+"""order claims for parallel tick workers
+
+Revision ID: 0007_order_claims
+Revises: 0006_notification_outbox
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007_order_claims"
+down_revision = "0006_notification_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("orders", sa.Column("claimed_by", sa.String(64), nullable=True))
+    op.add_column("orders", sa.Column("claimed_until", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.drop_column("claimed_until")
+        batch_op.drop_column("claimed_by")
@@ -0,0 +1,27 @@
+"""tick flight recorder log
+
+Revision ID: 0008_tick_log
+Revises: 0007_order_claims
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008_tick_log"
+down_revision = "0007_order_claims"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "tick_log",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("tick_log")
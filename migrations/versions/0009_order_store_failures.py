@@ -0,0 +1,23 @@
+"""pack id of paid purchases that failed to store
+
+Revision ID: 0009_order_store_failures
+Revises: 0008_tick_log
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009_order_store_failures"
+down_revision = "0008_tick_log"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("orders", sa.Column("failed_pack_id", sa.String(255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.drop_column("failed_pack_id")
@@ -0,0 +1,23 @@
+"""users who blocked the bot, separate from admin bans
+
+Revision ID: 0010_user_bot_blocked
+Revises: 0009_order_store_failures
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010_user_bot_blocked"
+down_revision = "0009_order_store_failures"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("users", sa.Column("bot_blocked_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("bot_blocked_at")
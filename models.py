@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import BigInteger, Boolean, DateTime, Float, Integer, String, Text, ForeignKey, func
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, Integer, String, Text, ForeignKey, Index, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from typing import List, Optional
 
@@ -15,6 +15,8 @@ class User(Base):
     username: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     first_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     is_blocked: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Користувач заблокував бота в Telegram; на відміну від is_blocked, знімається з наступним оновленням від нього
+    bot_blocked_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     
     orders: Mapped[List["Order"]] = relationship(back_populates="user", cascade="all, delete-orphan")
@@ -31,16 +33,26 @@ class Order(Base):
     status: Mapped[str] = mapped_column(String(50), default="active")
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # Оренда ордера обробником тіку: поки claimed_until у майбутньому, інші процеси його не беруть
+    claimed_by: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    claimed_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # Оплачений пакет, який не вдалося зберегти (статус store_failed) - для ручної звірки
+    failed_pack_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     
     user: Mapped["User"] = relationship(back_populates="orders")
     purchases: Mapped[List["Purchase"]] = relationship(back_populates="order", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_orders_user_id_status_created_at", "user_id", "status", "created_at"),
+        Index("ix_orders_status_is_2fa_target_price", "status", "is_2fa", "target_price"),
+    )
 
 
 class Purchase(Base):
     __tablename__ = "purchases"
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    order_id: Mapped[int] = mapped_column(Integer, ForeignKey("orders.id", ondelete="CASCADE"))
+    order_id: Mapped[int] = mapped_column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), index=True)
     pack_id: Mapped[str] = mapped_column(String(255), unique=True)
     accounts_count: Mapped[int] = mapped_column(Integer)
     price_paid: Mapped[float] = mapped_column(Float)
@@ -56,7 +68,7 @@ class Account(Base):
     __tablename__ = "accounts"
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    purchase_id: Mapped[int] = mapped_column(Integer, ForeignKey("purchases.id", ondelete="CASCADE"))
+    purchase_id: Mapped[int] = mapped_column(Integer, ForeignKey("purchases.id", ondelete="CASCADE"), index=True)
     email: Mapped[str] = mapped_column(String(255))
     password: Mapped[str] = mapped_column(String(255))
     recovery_email: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
@@ -73,6 +85,67 @@ class PriceHistory(Base):
     __tablename__ = "price_history"
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    timestamp: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    timestamp: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), index=True)
     price_no_2fa: Mapped[float] = mapped_column(Float)
-    price_2fa: Mapped[float] = mapped_column(Float)
\ No newline at end of file
+    price_2fa: Mapped[float] = mapped_column(Float)
+
+
+class PriceRollup(Base):
+    __tablename__ = "price_rollups"
+    
+    resolution: Mapped[str] = mapped_column(String(8), primary_key=True)
+    is_2fa: Mapped[bool] = mapped_column(Boolean, primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    open: Mapped[float] = mapped_column(Float)
+    high: Mapped[float] = mapped_column(Float)
+    low: Mapped[float] = mapped_column(Float)
+    close: Mapped[float] = mapped_column(Float)
+    samples: Mapped[int] = mapped_column(Integer, default=1)
+    last_at: Mapped[datetime] = mapped_column(DateTime)
+
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+    
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    accounts_no_2fa: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    accounts_2fa: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    spent_no_2fa: Mapped[float] = mapped_column(Float, default=0.0, server_default="0")
+    spent_2fa: Mapped[float] = mapped_column(Float, default=0.0, server_default="0")
+    orders_active: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    orders_completed: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    orders_cancelled: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    kind: Mapped[str] = mapped_column(String(50))
+    payload: Mapped[str] = mapped_column(Text)
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+
+class FsmState(Base):
+    __tablename__ = "fsm_states"
+    
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    data: Mapped[str] = mapped_column(Text, default="{}")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+
+class TickLog(Base):
+    __tablename__ = "tick_log"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    started_at: Mapped[datetime] = mapped_column(DateTime)
+    payload: Mapped[str] = mapped_column(Text)
@@ -1,67 +1,306 @@
-from datetime import datetime
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from models import Order, Purchase, Account, PriceHistory
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from database import async_session_maker
+from models import Order, Purchase, Account
 from api_client import api_client
-from typing import List, Dict, Any
+from price_cache import price_cache
+from price_history import record_price_tick
+from stats import apply_stats_delta
+from outbox import KIND_ORDER_EXECUTED, enqueue_notification
+from metrics import ORDER_TICK_ORDERS
+from flight_recorder import SKIP_CLAIM_LOST, SKIP_INSUFFICIENT_BALANCE, TickRecord
+from config import settings
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+ACCOUNT_COLUMNS = (
+    "purchase_id", "email", "password", "recovery_email", "recovery_email_messages_url",
+    "authenticator_token_2fa", "app_password", "messages_url", "status"
+)
+
+
+class BalanceLedger:
+    """Резервування балансу в межах одного тіку для паралельних покупок"""
+    
+    def __init__(self, balance: float):
+        self.available = balance
+        self._reservations: Dict[int, float] = {}
+    
+    def reserve(self, order_id: int, amount: float) -> bool:
+        if amount > self.available:
+            return False
+        self.available -= amount
+        self._reservations[order_id] = amount
+        return True
+    
+    def settle(self, order_id: int, actual_amount: float):
+        """Замінити резерв фактичною сумою покупки"""
+        self.available += self._reservations.pop(order_id, 0.0) - actual_amount
+    
+    def release(self, order_id: int):
+        self.available += self._reservations.pop(order_id, 0.0)
+
+
+class PurchaseStoreError(Exception):
+    """Пакет оплачено, але покупку не вдалося зберегти в БД"""
+    
+    def __init__(self, pack_id: Optional[str], total_price: Optional[float], error: Exception):
+        super().__init__(f"покупку не збережено (pack {pack_id}): {str(error)}")
+        self.pack_id = pack_id
+        self.total_price = total_price
+
 
 class OrderProcessor:
-    async def process_orders(self, session: AsyncSession) -> List[Dict[str, Any]]:
+    def __init__(self, session_maker: async_sessionmaker):
+        self.session_maker = session_maker
+    
+    async def process_orders(self, tick: Optional[TickRecord] = None) -> List[Dict[str, Any]]:
+        """Тік: ордери беруться в оренду порціями, кожна покупка зберігається в окремій короткій транзакції"""
         executed_orders = []
+        worker_id = uuid.uuid4().hex
+        claimed_count = 0
+        unaffordable_count = 0
+        tick = tick if tick is not None else TickRecord()
         
         try:
-            price_no_2fa = await api_client.get_price(is_2fa=False)
-            price_2fa = await api_client.get_price(is_2fa=True)
+            with tick.phase("price"):
+                snapshot = await price_cache.refresh()
+            prices = {False: snapshot.no_2fa, True: snapshot.with_2fa}
+            tick.prices = {"no_2fa": snapshot.no_2fa, "2fa": snapshot.with_2fa}
             
-            price_record = PriceHistory(price_no_2fa=price_no_2fa, price_2fa=price_2fa)
-            session.add(price_record)
-            await session.flush()
+            with tick.phase("record_price"):
+                async with self.session_maker() as session:
+                    await record_price_tick(session, snapshot.no_2fa, snapshot.with_2fa)
+                    await session.commit()
             
-            balance = await api_client.get_balance()
+            ledger = None
+            seen_ids: List[int] = []
+            semaphore = asyncio.Semaphore(settings.PURCHASE_CONCURRENCY)
             
-            query = select(Order).where(Order.status == "active").order_by(Order.target_price.asc())
-            result = await session.execute(query)
-            active_orders = result.scalars().all()
+            async def run_purchase(order: Row, current_price: float):
+                async with semaphore:
+                    try:
+                        purchase_result = await self._execute_purchase(order, worker_id, tick)
+                    except PurchaseStoreError as e:
+                        # Гроші вже списані, тому резерв не повертається решті тіку
+                        spent = e.total_price if e.total_price is not None else current_price * order.quantity
+                        ledger.settle(order.id, spent)
+                        tick.skip(order.id, str(e))
+                        logger.error(f"Order {order.id}: Paid but not stored - {str(e)}")
+                        return None
+                    except Exception as e:
+                        ledger.release(order.id)
+                        tick.skip(order.id, f"помилка покупки: {str(e)}")
+                        logger.error(f"Order {order.id}: Failed - {str(e)}")
+                        return None
+                if purchase_result is None:
+                    ledger.release(order.id)
+                    tick.skip(order.id, SKIP_CLAIM_LOST)
+                    logger.warning(f"Order {order.id}: Claim expired before purchase")
+                    return None
+                ledger.settle(order.id, purchase_result['total_price'])
+                tick.filled.append(order.id)
+                logger.info(f"Order {order.id}: Executed")
+                return purchase_result
             
-            logger.info(f"Processing {len(active_orders)} orders. Balance: ${balance}")
-            
-            for order in active_orders:
-                current_price = price_2fa if order.is_2fa else price_no_2fa
-                
-                if current_price > order.target_price:
+            while True:
+                # Після отримання балансу беруться лише ордери, які ще вміщаються в доступний залишок
+                max_cost = ledger.available if ledger is not None else None
+                with tick.phase("claim"):
+                    candidate_ids, claimed_orders = await self._claim_orders(worker_id, prices, seen_ids, max_cost)
+                if not candidate_ids:
+                    break
+                # Кандидати, які виграв інший обробник, теж не розглядаються повторно
+                seen_ids += candidate_ids
+                if not claimed_orders:
                     continue
+                claimed_count += len(claimed_orders)
+                tick.considered += len(claimed_orders)
                 
-                estimated_cost = current_price * order.quantity
-                if balance < estimated_cost:
-                    logger.info(f"Order {order.id}: Insufficient balance")
-                    continue
+                if ledger is None:
+                    # Баланс потрібен лише для покупок, тому тік без кандидатів не витрачає на нього запит
+                    with tick.phase("balance"):
+                        balance = await api_client.get_balance()
+                    tick.balance = balance
+                    ledger = BalanceLedger(balance)
+                    logger.info(f"Processing fillable orders. Balance: ${balance}")
                 
-                try:
-                    purchase_result = await self._execute_purchase(session, order, current_price)
-                    if purchase_result:
-                        executed_orders.append(purchase_result)
-                        balance -= purchase_result['total_price']
-                        logger.info(f"Order {order.id}: Executed")
-                except Exception as e:
-                    logger.error(f"Order {order.id}: Failed - {str(e)}")
-                    continue
-            
-            await session.commit()
+                reserved_orders = []
+                unaffordable_ids = []
+                for order in claimed_orders:
+                    current_price = prices[order.is_2fa]
+                    
+                    estimated_cost = current_price * order.quantity
+                    if not ledger.reserve(order.id, estimated_cost):
+                        logger.info(f"Order {order.id}: Insufficient balance")
+                        unaffordable_ids.append(order.id)
+                        tick.skip(order.id, SKIP_INSUFFICIENT_BALANCE)
+                        continue
+                    reserved_orders.append((order, current_price))
+                
+                if unaffordable_ids:
+                    unaffordable_count += len(unaffordable_ids)
+                    with tick.phase("release"):
+                        await self._release_claims(worker_id, unaffordable_ids)
+                
+                results = await asyncio.gather(*(run_purchase(order, price) for order, price in reserved_orders))
+                executed_orders += [result for result in results if result]
             
         except Exception as e:
             logger.error(f"Error processing orders: {str(e)}")
-            await session.rollback()
+            tick.error = str(e)
+            try:
+                await self._release_claims(worker_id)
+            except Exception as release_error:
+                logger.error(f"Failed to release order claims: {str(release_error)}")
         
+        ORDER_TICK_ORDERS.labels("claimed").observe(claimed_count)
+        ORDER_TICK_ORDERS.labels("filled").observe(len(executed_orders))
+        ORDER_TICK_ORDERS.labels("unaffordable").observe(unaffordable_count)
+        ORDER_TICK_ORDERS.labels("failed").observe(max(claimed_count - unaffordable_count - len(executed_orders), 0))
         return executed_orders
     
-    async def _execute_purchase(self, session: AsyncSession, order: Order, current_price: float) -> Dict[str, Any]:
-        try:
-            purchase_data = await api_client.buy_accounts(count=order.quantity, is_2fa=order.is_2fa)
+    async def _claim_orders(
+        self,
+        worker_id: str,
+        prices: Dict[bool, float],
+        exclude_ids: List[int],
+        max_cost: Optional[float] = None
+    ) -> Tuple[List[int], List[Row]]:
+        """Взяти в оренду порцію активних ордерів, які можна виконати за поточними цінами
+        
+        Повертає всіх кандидатів і ті з них, які дістались цьому обробнику.
+        """
+        now = datetime.utcnow()
+        unclaimed = or_(Order.claimed_until.is_(None), Order.claimed_until < now)
+        
+        fillable = []
+        for is_2fa, price in prices.items():
+            condition = and_(Order.is_2fa == is_2fa, Order.target_price >= price)
+            if max_cost is not None:
+                condition = and_(condition, Order.quantity * price <= max_cost)
+            fillable.append(condition)
+        
+        query = select(Order.id).where(
+            Order.status == "active",
+            unclaimed,
+            or_(*fillable)
+        ).order_by(
+            Order.target_price.asc(), Order.id.asc()
+        ).limit(
+            settings.ORDER_CLAIM_BATCH_SIZE
+        ).with_for_update(
+            # PostgreSQL пропускає рядки, які зараз бере інший процес; SQLite ігнорує FOR UPDATE
+            skip_locked=True
+        )
+        if exclude_ids:
+            query = query.where(Order.id.not_in(exclude_ids))
+        
+        async with self.session_maker() as session:
+            candidate_ids = list((await session.execute(query)).scalars().all())
+            if not candidate_ids:
+                return [], []
             
+            # Умовне оновлення захищає від подвійної оренди і там, де немає блокувань рядків
+            await session.execute(
+                update(Order)
+                .where(Order.id.in_(candidate_ids), Order.status == "active", unclaimed)
+                .values(claimed_by=worker_id, claimed_until=now + timedelta(seconds=settings.ORDER_CLAIM_LEASE_SECONDS))
+            )
+            result = await session.execute(
+                select(Order.id, Order.user_id, Order.target_price, Order.quantity, Order.is_2fa)
+                .where(Order.id.in_(candidate_ids), Order.claimed_by == worker_id)
+                .order_by(Order.target_price.asc(), Order.id.asc())
+            )
+            claimed_orders = list(result.all())
+            await session.commit()
+        
+        return candidate_ids, claimed_orders
+    
+    async def _release_claims(self, worker_id: str, order_ids: Optional[List[int]] = None):
+        """Повернути ордери іншим обробникам; без order_ids - всі ордери цього тіку"""
+        query = update(Order).where(Order.claimed_by == worker_id)
+        if order_ids is not None:
+            query = query.where(Order.id.in_(order_ids))
+        async with self.session_maker() as session:
+            await session.execute(query.values(claimed_by=None, claimed_until=None))
+            await session.commit()
+    
+    async def _renew_claim(self, worker_id: str, order_id: int) -> bool:
+        """Продовжити оренду перед покупкою; False - оренда сплила і ордер міг взяти інший процес"""
+        now = datetime.utcnow()
+        async with self.session_maker() as session:
+            result = await session.execute(
+                update(Order)
+                .where(
+                    Order.id == order_id,
+                    Order.status == "active",
+                    Order.claimed_by == worker_id,
+                    Order.claimed_until > now
+                )
+                .values(claimed_until=now + timedelta(seconds=settings.ORDER_CLAIM_LEASE_SECONDS))
+            )
+            await session.commit()
+        return result.rowcount > 0
+    
+    async def _execute_purchase(self, order: Row, worker_id: str, tick: Optional[TickRecord] = None) -> Optional[Dict[str, Any]]:
+        """Купити пакет для ордера; None - оренду втрачено, покупка не виконувалась"""
+        tick = tick if tick is not None else TickRecord()
+        # Покупки чекають на семафор, тому оренда з моменту взяття порції могла вже сплисти
+        with tick.phase(f"renew #{order.id}"):
+            if not await self._renew_claim(worker_id, order.id):
+                return None
+        
+        try:
+            with tick.phase(f"buy #{order.id}"):
+                purchase_data = await api_client.buy_accounts(count=order.quantity, is_2fa=order.is_2fa)
+        except Exception as e:
+            logger.error(f"Failed to execute purchase: {str(e)}")
+            await self._release_claims(worker_id, [order.id])
+            raise
+        
+        # Пакет уже оплачено: якщо збереження впаде, ордер виводиться з обробки, щоб його не купили вдруге
+        try:
+            with tick.phase(f"commit #{order.id}"):
+                async with self.session_maker() as session:
+                    order_info = await self._store_purchase(session, order, purchase_data, worker_id)
+                    await session.commit()
+        except Exception as e:
+            await self._mark_store_failed(order, worker_id, purchase_data.get('packId'))
+            raise PurchaseStoreError(purchase_data.get('packId'), purchase_data.get('totalUsdPrice'), e) from e
+        return order_info
+    
+    async def _mark_store_failed(self, order: Row, worker_id: str, pack_id: Optional[str]):
+        """Позначити ордер store_failed для ручної звірки з пакетом pack_id"""
+        try:
+            async with self.session_maker() as session:
+                result = await session.execute(
+                    update(Order)
+                    .where(Order.id == order.id, Order.status == "active", Order.claimed_by == worker_id)
+                    .values(status="store_failed", failed_pack_id=pack_id, claimed_by=None, claimed_until=None)
+                )
+                if result.rowcount > 0:
+                    await apply_stats_delta(session, order.user_id, orders_active=-1)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Failed to mark order {order.id} as store_failed: {str(e)}")
+            return
+        logger.error(f"Order {order.id} (user {order.user_id}) needs manual review: pack {pack_id} is paid but not stored")
+    
+    async def _store_purchase(
+        self,
+        session: AsyncSession,
+        order: Row,
+        purchase_data: Dict[str, Any],
+        worker_id: str
+    ) -> Dict[str, Any]:
+        try:
             purchase = Purchase(
                 order_id=order.id,
                 pack_id=purchase_data['packId'],
@@ -73,23 +312,24 @@ class OrderProcessor:
             session.add(purchase)
             await session.flush()
             
-            for account_data in purchase_data.get('accounts', []):
-                account = Account(
-                    purchase_id=purchase.id,
-                    email=account_data['email'],
-                    password=account_data['password'],
-                    recovery_email=account_data.get('recoveryEmail'),
-                    recovery_email_messages_url=account_data.get('recoveryEmailMessagesUrl'),
-                    authenticator_token_2fa=account_data.get('authenticatorToken2FA'),
-                    app_password=account_data.get('appPassword'),
-                    messages_url=account_data.get('messagesUrl')
-                )
-                session.add(account)
+            await self._insert_accounts(session, purchase.id, purchase_data.get('accounts', []))
+            
+            result = await session.execute(
+                update(Order)
+                .where(Order.id == order.id, Order.status == "active", Order.claimed_by == worker_id)
+                .values(status="completed", completed_at=datetime.utcnow(), claimed_by=None, claimed_until=None)
+            )
             
-            order.status = "completed"
-            order.completed_at = datetime.utcnow()
+            type_suffix = "2fa" if purchase.is_2fa else "no_2fa"
+            deltas = {f"accounts_{type_suffix}": purchase.accounts_count, f"spent_{type_suffix}": purchase.total_price}
+            if result.rowcount > 0:
+                deltas.update(orders_active=-1, orders_completed=1)
+            else:
+                # Оренда сплила, і ордер скасували або взяв інший процес: оплачена покупка зберігається, лічильники ордерів не чіпаємо
+                logger.warning(f"Order {order.id} is no longer held by this tick, storing purchase {purchase.pack_id} as is")
+            await apply_stats_delta(session, order.user_id, **deltas)
             
-            return {
+            order_info = {
                 'order_id': order.id,
                 'user_id': order.user_id,
                 'pack_id': purchase.pack_id,
@@ -98,14 +338,47 @@ class OrderProcessor:
                 'total_price': purchase.total_price,
                 'is_2fa': purchase.is_2fa
             }
+            enqueue_notification(session, order.user_id, KIND_ORDER_EXECUTED, order_info)
+            return order_info
         except Exception as e:
-            logger.error(f"Failed to execute purchase: {str(e)}")
+            logger.error(f"Failed to store purchase {purchase_data.get('packId')}: {str(e)}")
             raise
     
+    async def _insert_accounts(self, session: AsyncSession, purchase_id: int, accounts_data: List[Dict[str, Any]]):
+        """Пакетна вставка акаунтів покупки без створення ORM об'єктів"""
+        if not accounts_data:
+            return
+        
+        records = [
+            (
+                purchase_id,
+                account_data['email'],
+                account_data['password'],
+                account_data.get('recoveryEmail'),
+                account_data.get('recoveryEmailMessagesUrl'),
+                account_data.get('authenticatorToken2FA'),
+                account_data.get('appPassword'),
+                account_data.get('messagesUrl'),
+                "available"
+            )
+            for account_data in accounts_data
+        ]
+        
+        connection = await session.connection()
+        if connection.dialect.driver == "asyncpg":
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                Account.__tablename__, records=records, columns=ACCOUNT_COLUMNS
+            )
+        else:
+            await session.execute(
+                insert(Account),
+                [dict(zip(ACCOUNT_COLUMNS, record)) for record in records]
+            )
+    
     async def get_current_prices(self) -> Dict[str, float]:
-        price_no_2fa = await api_client.get_price(is_2fa=False)
-        price_2fa = await api_client.get_price(is_2fa=True)
-        return {'no_2fa': price_no_2fa, '2fa': price_2fa}
+        snapshot = await price_cache.get_snapshot()
+        return snapshot.as_dict()
 
 
-order_processor = OrderProcessor()
\ No newline at end of file
+order_processor = OrderProcessor(async_session_maker)
\ No newline at end of file
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy import delete, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from broadcast import RateLimiter
+from models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+KIND_ORDER_EXECUTED = "order_executed"
+
+STATUS_PENDING = "pending"
+STATUS_FAILED = "failed"
+
+# Скільки записів outbox одного типу об'єднується в одне повідомлення
+ORDERS_PER_MESSAGE = 20
+
+
+def enqueue_notification(session: AsyncSession, user_id: int, kind: str, payload: Dict[str, Any]):
+    """Додати повідомлення в outbox у поточній транзакції - воно збережеться лише разом з нею"""
+    session.add(NotificationOutbox(
+        user_id=user_id,
+        kind=kind,
+        payload=json.dumps(payload, ensure_ascii=False),
+        status=STATUS_PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    ))
+
+
+def render_order_executed(payloads: List[Dict[str, Any]]) -> Tuple[str, InlineKeyboardMarkup]:
+    """Одне виконання - картка ордера, кілька (до ORDERS_PER_MESSAGE) - зведення"""
+    from keyboards import order_card_buttons, orders_page_buttons
+
+    if len(payloads) == 1:
+        order_info = payloads[0]
+        message = (
+            f"✅ <b>Ордер #{order_info['order_id']} виконано!</b>\n\n"
+            f"Куплено: <b>{order_info['accounts_count']}</b> акаунтів\n"
+            f"Ціна: <b>${order_info['price_paid']:.2f}</b> за шт\n"
+            f"Загальна сума: <b>${order_info['total_price']:.2f}</b>\n"
+            f"Pack ID: <code>{order_info['pack_id']}</code>\n\n"
+            f"Акаунти збережено в системі ✓"
+        )
+        return message, order_card_buttons(order_info['order_id'], has_accounts=True)
+
+    lines = "".join(
+        f"• #{order_info['order_id']}: {order_info['accounts_count']} шт по ${order_info['price_paid']:.2f} "
+        f"= ${order_info['total_price']:.2f}\n"
+        for order_info in payloads
+    )
+    message = (
+        f"✅ <b>Виконано ордерів: {len(payloads)}</b>\n\n"
+        f"{lines}\n"
+        f"Всього: <b>{sum(order_info['accounts_count'] for order_info in payloads)}</b> акаунтів "
+        f"на <b>${sum(order_info['total_price'] for order_info in payloads):.2f}</b>\n\n"
+        f"Акаунти збережено в системі ✓"
+    )
+    order_ids = [order_info['order_id'] for order_info in payloads]
+    return message, orders_page_buttons("completed", order_ids, has_prev=False, has_next=False)
+
+
+RENDERERS = {
+    KIND_ORDER_EXECUTED: render_order_executed,
+}
+
+
+class NotificationDispatcher:
+    """Доставка повідомлень з таблиці outbox пулом воркерів; повідомлення одного чату йдуть по черзі"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        session_maker: async_sessionmaker,
+        limiter: RateLimiter,
+        workers: int,
+        batch_size: int,
+        poll_seconds: float,
+        lease_seconds: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        on_blocked: Optional[Callable[[List[int]], Awaitable[None]]] = None
+    ):
+        self.bot = bot
+        self.session_maker = session_maker
+        self.limiter = limiter
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.on_blocked = on_blocked
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._in_flight: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._dispatch())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Notification outbox started with {self.workers} workers")
+
+    def stop(self):
+        # Незавершені повідомлення повернуться в роботу після закінчення оренди
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def wake(self):
+        """Забрати нові повідомлення одразу, не чекаючи інтервалу опитування"""
+        self._wakeup.set()
+
+    async def _dispatch(self):
+        while True:
+            try:
+                groups = await self._claim()
+                for user_id, rows in groups.items():
+                    self._in_flight.add(user_id)
+                    self.queue.put_nowait((user_id, rows))
+            except Exception as e:
+                logger.error(f"Failed to claim outbox notifications: {str(e)}")
+                groups = {}
+
+            if sum(len(rows) for rows in groups.values()) >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim(self) -> Dict[int, List[Row]]:
+        """Взяти в оренду готові повідомлення користувачів, яких зараз ніхто не обслуговує"""
+        now = datetime.utcnow()
+        query = select(
+            NotificationOutbox.id, NotificationOutbox.user_id, NotificationOutbox.kind,
+            NotificationOutbox.payload, NotificationOutbox.attempts
+        ).where(
+            NotificationOutbox.status == STATUS_PENDING,
+            NotificationOutbox.next_attempt_at <= now
+        ).order_by(NotificationOutbox.id).limit(self.batch_size).with_for_update(skip_locked=True)
+        if self._in_flight:
+            query = query.where(NotificationOutbox.user_id.not_in(self._in_flight))
+
+        async with self.session_maker() as session:
+            rows = (await session.execute(query)).all()
+            if rows:
+                await session.execute(
+                    update(NotificationOutbox)
+                    .where(NotificationOutbox.id.in_([row.id for row in rows]))
+                    .values(next_attempt_at=now + self.lease)
+                )
+            await session.commit()
+
+        groups: Dict[int, List[Row]] = defaultdict(list)
+        for row in rows:
+            groups[row.user_id].append(row)
+        return groups
+
+    async def _worker(self):
+        while True:
+            user_id, rows = await self.queue.get()
+            try:
+                await self._deliver(user_id, rows)
+            except Exception as e:
+                logger.error(f"Failed to deliver notifications to user {user_id}: {str(e)}")
+            finally:
+                self._in_flight.discard(user_id)
+                self.queue.task_done()
+
+    async def _deliver(self, user_id: int, rows: Sequence[Row]):
+        by_kind: Dict[str, List[Row]] = defaultdict(list)
+        for row in rows:
+            by_kind[row.kind].append(row)
+
+        for kind, kind_rows in by_kind.items():
+            renderer = RENDERERS.get(kind)
+            if renderer is None:
+                await self._fail(kind_rows, f"Unknown notification kind: {kind}", final=True)
+                continue
+
+            # Кожна порція видаляється одразу після відправки, тож повтор не дублює вже доставлені
+            for start in range(0, len(kind_rows), ORDERS_PER_MESSAGE):
+                chunk = kind_rows[start:start + ORDERS_PER_MESSAGE]
+                unsent = kind_rows[start:]
+                try:
+                    text, markup = renderer([json.loads(row.payload) for row in chunk])
+                    await self.limiter.acquire()
+                    await self.bot.send_message(chat_id=user_id, text=text, parse_mode="HTML", reply_markup=markup)
+                except TelegramRetryAfter as e:
+                    logger.warning(f"Flood control, retry after {e.retry_after}s")
+                    self.limiter.pause(e.retry_after)
+                    await self._retry_at(unsent, datetime.utcnow() + timedelta(seconds=e.retry_after))
+                    break
+                except TelegramForbiddenError:
+                    await self._delete(unsent)
+                    if self.on_blocked is not None:
+                        await self.on_blocked([user_id])
+                    break
+                except Exception as e:
+                    await self._fail(unsent, str(e))
+                    break
+
+                await self._delete(chunk)
+
+    async def _delete(self, rows: Sequence[Row]):
+        async with self.session_maker() as session:
+            await session.execute(delete(NotificationOutbox).where(NotificationOutbox.id.in_([row.id for row in rows])))
+            await session.commit()
+
+    async def _retry_at(self, rows: Sequence[Row], when: datetime):
+        async with self.session_maker() as session:
+            await session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_([row.id for row in rows]))
+                .values(next_attempt_at=when)
+            )
+            await session.commit()
+
+    async def _fail(self, rows: Sequence[Row], error: str, final: bool = False):
+        """Відкласти з експоненційною затримкою; після max_attempts спроб - позначити failed"""
+        attempts = max(row.attempts for row in rows) + 1
+        final = final or attempts >= self.max_attempts
+        delay = self.retry_base_seconds * 2 ** (attempts - 1)
+        logger.error(f"Notification delivery failed (attempt {attempts}/{self.max_attempts}): {error}")
+
+        async with self.session_maker() as session:
+            await session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_([row.id for row in rows]))
+                .values(
+                    attempts=NotificationOutbox.attempts + 1,
+                    status=STATUS_FAILED if final else STATUS_PENDING,
+                    next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+                    last_error=error
+                )
+            )
+            await session.commit()
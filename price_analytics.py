@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config import settings
+from database import async_read_session_maker
+from models import PriceRollup
+from price_history import RESOLUTION_HOUR
+
+logger = logging.getLogger(__name__)
+
+HOUR_SECONDS = 3600
+PERCENTILES = (10, 25, 50, 75, 90)
+SUGGESTED_FILL_PROBABILITIES = (0.9, 0.75, 0.5)
+
+
+def hour_index(timestamp: datetime) -> int:
+    return int(timestamp.replace(tzinfo=timezone.utc).timestamp()) // HOUR_SECONDS
+
+
+def hour_start(index: int) -> datetime:
+    return datetime.fromtimestamp(index * HOUR_SECONDS, tz=timezone.utc).replace(tzinfo=None)
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    """Мінімум у ковзному вікні; NaN пропускаються, вікно з одних NaN дає NaN"""
+    if len(values) < window:
+        return np.empty(0)
+    return np.fmin.reduce(sliding_window_view(values, window), axis=1)
+
+
+class HourlyPriceSeries:
+    """Погодинні low/close на щільній сітці годин; пропущені години - NaN"""
+
+    def __init__(self, max_hours: int):
+        self.max_hours = max_hours
+        self.first_hour: Optional[int] = None
+        self.low = np.empty(0)
+        self.close = np.empty(0)
+        self._drawdowns: Dict[int, np.ndarray] = {}
+
+    @property
+    def last_hour(self) -> Optional[int]:
+        if self.first_hour is None:
+            return None
+        return self.first_hour + len(self.close) - 1
+
+    @property
+    def samples(self) -> int:
+        return int(np.count_nonzero(np.isfinite(self.close)))
+
+    def merge(self, hours: np.ndarray, lows: np.ndarray, closes: np.ndarray):
+        """Записати свічки у сітку; вже відомі години (зокрема відкрита остання) перезаписуються"""
+        if len(hours) == 0:
+            return
+        if self.first_hour is None:
+            self.first_hour = int(hours.min())
+
+        positions = hours - self.first_hour
+        keep = positions >= 0
+        positions, lows, closes = positions[keep], lows[keep], closes[keep]
+        if len(positions) == 0:
+            return
+
+        grow = int(positions.max()) + 1 - len(self.close)
+        if grow > 0:
+            self.low = np.concatenate((self.low, np.full(grow, np.nan)))
+            self.close = np.concatenate((self.close, np.full(grow, np.nan)))
+        self.low[positions] = lows
+        self.close[positions] = closes
+
+        overflow = len(self.close) - self.max_hours
+        if overflow > 0:
+            self.low = self.low[overflow:].copy()
+            self.close = self.close[overflow:].copy()
+            self.first_hour += overflow
+        self._drawdowns.clear()
+
+    def drawdowns(self, horizon_hours: int) -> np.ndarray:
+        """Відсортовані відношення мінімальної ціни за наступні horizon_hours годин до ціни на старті"""
+        cached = self._drawdowns.get(horizon_hours)
+        if cached is not None:
+            return cached
+
+        future_low = rolling_min(self.low[1:], horizon_hours)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratios = future_low / self.close[:len(future_low)]
+        cached = np.sort(ratios[np.isfinite(ratios)])
+        self._drawdowns[horizon_hours] = cached
+        return cached
+
+    def fill_probability(self, ratio: float, horizon_hours: int) -> Optional[float]:
+        """Частка історичних вікон, у яких ціна опускалась до ratio від стартової"""
+        drawdowns = self.drawdowns(horizon_hours)
+        if len(drawdowns) == 0:
+            return None
+        return float(np.searchsorted(drawdowns, ratio, side="right")) / len(drawdowns)
+
+
+@dataclass(frozen=True)
+class TargetSuggestion:
+    price: float
+    probability: float
+
+
+@dataclass(frozen=True)
+class PriceInsights:
+    current_price: float
+    horizon_hours: int
+    percentiles: Dict[int, float]
+    rolling_min: float
+    rolling_mean: float
+    volatility: float
+    suggestions: List[TargetSuggestion]
+
+
+class PriceAnalytics:
+    """Статистика погодинних цін для підказок цільової ціни; масиви кешуються і дочитуються інкрементально"""
+
+    def __init__(self, session_maker: async_sessionmaker, lookback_days: int, refresh_seconds: float, min_samples: int):
+        self.session_maker = session_maker
+        self.lookback = timedelta(days=lookback_days)
+        self.refresh_seconds = refresh_seconds
+        self.min_samples = min_samples
+        self._series = {
+            False: HourlyPriceSeries(max_hours=lookback_days * 24),
+            True: HourlyPriceSeries(max_hours=lookback_days * 24),
+        }
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def series(self, is_2fa: bool) -> HourlyPriceSeries:
+        return self._series[is_2fa]
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds
+
+    async def _ensure_fresh(self):
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Підказки не критичні: працюємо з тим, що вже завантажено
+                logger.warning(f"Price analytics refresh failed: {str(e)}")
+
+    async def refresh(self):
+        """Дочитати годинні свічки, починаючи з останньої відомої (вона могла змінитись)"""
+        last_hours = [series.last_hour for series in self._series.values() if series.last_hour is not None]
+        since = hour_start(min(last_hours)) if last_hours else datetime.utcnow() - self.lookback
+
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(PriceRollup.is_2fa, PriceRollup.bucket_start, PriceRollup.low, PriceRollup.close).where(
+                    PriceRollup.resolution == RESOLUTION_HOUR,
+                    PriceRollup.bucket_start >= since
+                ).order_by(PriceRollup.bucket_start)
+            )
+            rows = result.all()
+
+        for is_2fa, series in self._series.items():
+            selected = [row for row in rows if row.is_2fa == is_2fa]
+            series.merge(
+                np.fromiter((hour_index(row.bucket_start) for row in selected), dtype=np.int64, count=len(selected)),
+                np.fromiter((row.low for row in selected), dtype=np.float64, count=len(selected)),
+                np.fromiter((row.close for row in selected), dtype=np.float64, count=len(selected))
+            )
+        self._loaded_at = time.monotonic()
+
+    async def get_insights(self, is_2fa: bool, current_price: float, horizon_hours: Optional[int] = None) -> Optional[PriceInsights]:
+        """Перцентилі, ковзні показники, волатильність і цільові ціни з імовірністю виконання; None - замало історії"""
+        await self._ensure_fresh()
+        horizon_hours = horizon_hours or settings.PRICE_ANALYTICS_HORIZON_HOURS
+        series = self._series[is_2fa]
+        if series.samples < self.min_samples:
+            return None
+
+        closes = series.close[np.isfinite(series.close)]
+        percentiles = dict(zip(PERCENTILES, np.percentile(closes, PERCENTILES).tolist()))
+        day_window = series.close[-24:]
+        returns = np.diff(np.log(series.close))
+        # Денна волатильність з погодинних лог-доходностей
+        volatility = float(np.nanstd(returns) * np.sqrt(24)) if np.isfinite(returns).any() else 0.0
+
+        suggestions = []
+        drawdowns = series.drawdowns(horizon_hours)
+        if len(drawdowns):
+            for ratio in np.quantile(drawdowns, SUGGESTED_FILL_PROBABILITIES):
+                price = round(current_price * float(ratio), 2)
+                if price <= 0 or price >= current_price or any(s.price == price for s in suggestions):
+                    continue
+                probability = series.fill_probability(price / current_price, horizon_hours)
+                suggestions.append(TargetSuggestion(price=price, probability=probability))
+
+        return PriceInsights(
+            current_price=current_price,
+            horizon_hours=horizon_hours,
+            percentiles=percentiles,
+            rolling_min=float(np.nanmin(day_window)) if np.isfinite(day_window).any() else current_price,
+            rolling_mean=float(np.nanmean(day_window)) if np.isfinite(day_window).any() else current_price,
+            volatility=volatility,
+            suggestions=suggestions
+        )
+
+    async def fill_probability(
+        self,
+        is_2fa: bool,
+        target_price: float,
+        current_price: float,
+        horizon_hours: Optional[int] = None
+    ) -> Optional[float]:
+        """Історична ймовірність, що ціна опуститься до target_price протягом horizon_hours"""
+        if target_price >= current_price:
+            return 1.0
+        await self._ensure_fresh()
+        series = self._series[is_2fa]
+        if series.samples < self.min_samples or current_price <= 0:
+            return None
+        return series.fill_probability(target_price / current_price, horizon_hours or settings.PRICE_ANALYTICS_HORIZON_HOURS)
+
+
+# Аналітика лише читає історію, тому працює з реплікою, якщо вона налаштована
+price_analytics = PriceAnalytics(
+    async_read_session_maker,
+    lookback_days=settings.PRICE_ANALYTICS_LOOKBACK_DAYS,
+    refresh_seconds=settings.PRICE_ANALYTICS_REFRESH_SECONDS,
+    min_samples=settings.PRICE_ANALYTICS_MIN_SAMPLES
+)
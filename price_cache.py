@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional
+
+from api_client import api_client
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PriceSnapshot:
+    """Знімок цін на момент запиту до API"""
+    no_2fa: float
+    with_2fa: float
+    fetched_at: datetime = field(default_factory=datetime.now)
+    fetched_monotonic: float = field(default_factory=time.monotonic)
+    
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.fetched_monotonic
+    
+    @property
+    def is_stale(self) -> bool:
+        return self.age_seconds > settings.PRICE_CACHE_TTL_SECONDS
+    
+    def price_for(self, is_2fa: bool) -> float:
+        return self.with_2fa if is_2fa else self.no_2fa
+    
+    def as_dict(self) -> Dict[str, float]:
+        return {'no_2fa': self.no_2fa, '2fa': self.with_2fa}
+
+
+class PriceSnapshotService:
+    """Спільний кеш цін з TTL та об'єднанням паралельних запитів"""
+    
+    def __init__(self, ttl_seconds: float, max_stale_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._snapshot: Optional[PriceSnapshot] = None
+        self._inflight: Optional[asyncio.Task] = None
+    
+    @property
+    def snapshot(self) -> Optional[PriceSnapshot]:
+        return self._snapshot
+    
+    async def get_snapshot(self) -> PriceSnapshot:
+        """Повернути свіжий знімок; при помилці API - останній відомий, якщо він не надто старий"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.age_seconds < self.ttl_seconds:
+            return snapshot
+        
+        try:
+            return await self.refresh()
+        except Exception as e:
+            if snapshot is not None and snapshot.age_seconds < self.max_stale_seconds:
+                logger.warning(f"Price refresh failed, serving stale snapshot: {str(e)}")
+                return snapshot
+            raise
+    
+    async def refresh(self) -> PriceSnapshot:
+        """Примусово оновити ціни; паралельні виклики чекають один запит"""
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+            self._inflight.add_done_callback(self._on_fetch_done)
+        return await asyncio.shield(self._inflight)
+    
+    async def _fetch(self) -> PriceSnapshot:
+        price_no_2fa, price_2fa = await asyncio.gather(
+            api_client.get_price(is_2fa=False),
+            api_client.get_price(is_2fa=True)
+        )
+        snapshot = PriceSnapshot(no_2fa=price_no_2fa, with_2fa=price_2fa)
+        self._snapshot = snapshot
+        return snapshot
+    
+    def _on_fetch_done(self, task: asyncio.Task):
+        if self._inflight is task:
+            self._inflight = None
+        if not task.cancelled():
+            task.exception()
+
+
+price_cache = PriceSnapshotService(
+    ttl_seconds=settings.PRICE_CACHE_TTL_SECONDS,
+    max_stale_seconds=settings.PRICE_CACHE_MAX_STALE_SECONDS
+)
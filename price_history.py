@@ -0,0 +1,219 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models import PriceHistory, PriceRollup
+
+logger = logging.getLogger(__name__)
+
+RESOLUTION_RAW = "raw"
+RESOLUTION_MINUTE = "1m"
+RESOLUTION_HOUR = "1h"
+RESOLUTION_DAY = "1d"
+
+ROLLUP_RESOLUTIONS = (RESOLUTION_MINUTE, RESOLUTION_HOUR, RESOLUTION_DAY)
+
+BUCKET_SIZES = {
+    RESOLUTION_MINUTE: timedelta(minutes=1),
+    RESOLUTION_HOUR: timedelta(hours=1),
+    RESOLUTION_DAY: timedelta(days=1),
+}
+
+
+@dataclass(frozen=True)
+class PricePoint:
+    """Свічка OHLC; для сирих тіків усі чотири ціни однакові"""
+    timestamp: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    samples: int = 1
+
+
+@dataclass(frozen=True)
+class PriceSeries:
+    resolution: str
+    points: List[PricePoint]
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    if resolution == RESOLUTION_MINUTE:
+        return timestamp.replace(second=0, microsecond=0)
+    if resolution == RESOLUTION_HOUR:
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if resolution == RESOLUTION_DAY:
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp
+
+
+def retention(resolution: str) -> Optional[timedelta]:
+    """Скільки зберігаються дані рівня; None (або 0 днів) - без обмежень"""
+    days = {
+        RESOLUTION_RAW: settings.PRICE_HISTORY_RAW_RETENTION_DAYS,
+        RESOLUTION_MINUTE: settings.PRICE_ROLLUP_MINUTE_RETENTION_DAYS,
+        RESOLUTION_HOUR: settings.PRICE_ROLLUP_HOUR_RETENTION_DAYS,
+    }.get(resolution)
+    return timedelta(days=days) if days else None
+
+
+async def record_price_tick(
+    session: AsyncSession,
+    price_no_2fa: float,
+    price_2fa: float,
+    timestamp: Optional[datetime] = None
+):
+    """Записати тік і оновити свічки всіх рівнів у поточній транзакції"""
+    timestamp = timestamp or datetime.utcnow()
+    session.add(PriceHistory(timestamp=timestamp, price_no_2fa=price_no_2fa, price_2fa=price_2fa))
+
+    rows = [
+        {
+            "resolution": resolution,
+            "is_2fa": is_2fa,
+            "bucket_start": bucket_start(timestamp, resolution),
+            "open": price,
+            "high": price,
+            "low": price,
+            "close": price,
+            "samples": 1,
+            "last_at": timestamp,
+        }
+        for is_2fa, price in ((False, price_no_2fa), (True, price_2fa))
+        for resolution in ROLLUP_RESOLUTIONS
+    ]
+    await _upsert_rollups(session, rows)
+
+
+async def _upsert_rollups(session: AsyncSession, rows: List[dict]):
+    dialect = session.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(PriceRollup).values(rows)
+        new = stmt.excluded
+        is_newer = new.last_at >= PriceRollup.last_at
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PriceRollup.resolution, PriceRollup.is_2fa, PriceRollup.bucket_start],
+            set_={
+                "high": case((new.high > PriceRollup.high, new.high), else_=PriceRollup.high),
+                "low": case((new.low < PriceRollup.low, new.low), else_=PriceRollup.low),
+                "close": case((is_newer, new.close), else_=PriceRollup.close),
+                "last_at": case((is_newer, new.last_at), else_=PriceRollup.last_at),
+                "samples": PriceRollup.samples + new.samples,
+            }
+        )
+        await session.execute(stmt)
+        return
+
+    for row in rows:
+        price, timestamp = row["close"], row["last_at"]
+        is_newer = PriceRollup.last_at <= timestamp
+        result = await session.execute(
+            update(PriceRollup).where(
+                PriceRollup.resolution == row["resolution"],
+                PriceRollup.is_2fa == row["is_2fa"],
+                PriceRollup.bucket_start == row["bucket_start"]
+            ).values(
+                high=case((PriceRollup.high < price, price), else_=PriceRollup.high),
+                low=case((PriceRollup.low > price, price), else_=PriceRollup.low),
+                close=case((is_newer, price), else_=PriceRollup.close),
+                last_at=case((is_newer, timestamp), else_=PriceRollup.last_at),
+                samples=PriceRollup.samples + 1
+            )
+        )
+        if result.rowcount == 0:
+            session.add(PriceRollup(**row))
+
+
+def raw_tick_interval() -> timedelta:
+    """Найменший крок між сирими тіками: адаптивні перевірки пишуть ціну аж до кожних ORDER_CHECK_MIN_SECONDS"""
+    if settings.ORDER_CHECK_ADAPTIVE:
+        seconds = settings.ORDER_CHECK_MIN_SECONDS * (1 - settings.ORDER_CHECK_JITTER)
+    else:
+        seconds = settings.PRICE_CHECK_INTERVAL_MINUTES * 60
+    return timedelta(seconds=max(seconds, 1.0))
+
+
+def choose_resolution(start: datetime, end: datetime, max_points: int, now: Optional[datetime] = None) -> str:
+    """Найдрібніший рівень, що ще зберігається для start і дає не більше max_points точок"""
+    now = now or datetime.utcnow()
+    span = end - start
+
+    for resolution, size in ((RESOLUTION_RAW, raw_tick_interval()), *BUCKET_SIZES.items()):
+        keep = retention(resolution)
+        if keep is not None and start < now - keep:
+            continue
+        if span / size <= max_points:
+            return resolution
+    return RESOLUTION_DAY
+
+
+async def get_price_history(
+    session: AsyncSession,
+    is_2fa: bool,
+    start: datetime,
+    end: Optional[datetime] = None,
+    max_points: Optional[int] = None
+) -> PriceSeries:
+    """Ціни за проміжок [start, end) у роздільності, придатній для екрана бота"""
+    end = end or datetime.utcnow()
+    resolution = choose_resolution(start, end, max_points or settings.PRICE_HISTORY_MAX_POINTS)
+
+    if resolution == RESOLUTION_RAW:
+        price_column = PriceHistory.price_2fa if is_2fa else PriceHistory.price_no_2fa
+        result = await session.execute(
+            select(PriceHistory.timestamp, price_column).where(
+                PriceHistory.timestamp >= start,
+                PriceHistory.timestamp < end
+            ).order_by(PriceHistory.timestamp)
+        )
+        points = [PricePoint(timestamp, price, price, price, price) for timestamp, price in result.all()]
+        return PriceSeries(resolution=resolution, points=points)
+
+    result = await session.execute(
+        select(
+            PriceRollup.bucket_start, PriceRollup.open, PriceRollup.high,
+            PriceRollup.low, PriceRollup.close, PriceRollup.samples
+        ).where(
+            PriceRollup.resolution == resolution,
+            PriceRollup.is_2fa == is_2fa,
+            PriceRollup.bucket_start >= bucket_start(start, resolution),
+            PriceRollup.bucket_start < end
+        ).order_by(PriceRollup.bucket_start)
+    )
+    points = [PricePoint(*row) for row in result.all()]
+    return PriceSeries(resolution=resolution, points=points)
+
+
+async def purge_price_history(session: AsyncSession, now: Optional[datetime] = None):
+    """Видалити сирі тіки та свічки, старші за термін зберігання свого рівня"""
+    now = now or datetime.utcnow()
+    removed = 0
+
+    keep = retention(RESOLUTION_RAW)
+    if keep is not None:
+        result = await session.execute(delete(PriceHistory).where(PriceHistory.timestamp < now - keep))
+        removed += result.rowcount
+
+    for resolution in ROLLUP_RESOLUTIONS:
+        keep = retention(resolution)
+        if keep is None:
+            continue
+        result = await session.execute(
+            delete(PriceRollup).where(
+                PriceRollup.resolution == resolution,
+                PriceRollup.bucket_start < now - keep
+            )
+        )
+        removed += result.rowcount
+
+    await session.commit()
+    if removed:
+        logger.info(f"Purged {removed} expired price history rows")
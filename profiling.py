@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject
+
+from config import settings
+from metrics import TIME_CATEGORIES, UPDATE_ERRORS, UPDATE_SECONDS, UpdateTimings, current_timings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HandlerTotals:
+    count: int = 0
+    total: float = 0.0
+    spent: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+
+
+class HandlerTimingStats:
+    """Накопичений час по хендлерах з моменту старту процесу"""
+
+    def __init__(self):
+        self.totals: Dict[str, HandlerTotals] = defaultdict(HandlerTotals)
+
+    def record(self, key: str, elapsed: float, timings: UpdateTimings):
+        totals = self.totals[key]
+        totals.count += 1
+        totals.total += elapsed
+        for category, seconds in timings.spent.items():
+            totals.spent[category] += seconds
+
+    def snapshot(self) -> Dict[str, Tuple[int, float, Dict[str, float]]]:
+        return {key: (totals.count, totals.total, dict(totals.spent)) for key, totals in self.totals.items()}
+
+
+handler_stats = HandlerTimingStats()
+
+
+def _format_breakdown(elapsed: float, timings: UpdateTimings) -> str:
+    parts = [
+        f"{category} {timings.spent[category]:.3f}s/{timings.calls[category]}"
+        for category in TIME_CATEGORIES if timings.calls[category]
+    ]
+    other = elapsed - sum(timings.spent.values())
+    parts.append(f"other {max(other, 0.0):.3f}s")
+    return ", ".join(parts)
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """Час кожного оновлення по хендлеру і префіксу callback_data; повільні оновлення - в лог з розбивкою"""
+
+    def __init__(self, slow_seconds: float):
+        self.slow_seconds = slow_seconds
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object is not None else "unknown"
+        prefix = event.data.split(":", 1)[0] if isinstance(event, CallbackQuery) and event.data else ""
+        key = f"{name}[{prefix}]" if prefix else name
+
+        timings = UpdateTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            UPDATE_ERRORS.labels(name, prefix).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            current_timings.reset(token)
+            UPDATE_SECONDS.labels(name, prefix).observe(elapsed)
+            handler_stats.record(key, elapsed, timings)
+            if elapsed >= self.slow_seconds:
+                logger.warning(f"Slow update {key}: {elapsed:.3f}s ({_format_breakdown(elapsed, timings)})")
+
+
+# ============ SAMPLING PROFILER ============
+@dataclass
+class ProfileResult:
+    started_at: datetime
+    duration: float
+    interval: float
+    stacks: Counter
+    handlers_before: Dict[str, Tuple[int, float, Dict[str, float]]]
+    handlers_after: Dict[str, Tuple[int, float, Dict[str, float]]]
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def render(self, top: int = 40) -> str:
+        """Текстовий звіт: найгарячіші функції, хендлери за час профілювання і згорнуті стеки для flamegraph"""
+        samples = self.samples or 1
+        idle = sum(count for stack, count in self.stacks.items() if stack and stack[-1].startswith("select "))
+        own = Counter()
+        cumulative = Counter()
+        for stack, count in self.stacks.items():
+            if stack:
+                own[stack[-1]] += count
+            for frame in set(stack):
+                cumulative[frame] += count
+
+        lines = [
+            f"Sampling profile started {self.started_at:%Y-%m-%d %H:%M:%S} UTC",
+            f"Duration {self.duration:.1f}s, {self.samples} samples every {self.interval * 1000:.0f} ms, "
+            f"event loop idle {idle / samples:.1%}",
+            "",
+            "Top functions by own samples:",
+            f"{'own':>7} {'total':>7}  function",
+        ]
+        for frame, count in own.most_common(top):
+            lines.append(f"{count / samples:7.1%} {cumulative[frame] / samples:7.1%}  {frame}")
+
+        lines += ["", "Handlers during profile:", f"{'count':>6} {'avg s':>8} {'db s':>8} {'api s':>8} {'tg s':>8}  handler"]
+        for key, (count, total, spent) in sorted(self.handlers_after.items()):
+            before_count, before_total, before_spent = self.handlers_before.get(key, (0, 0.0, {}))
+            count -= before_count
+            if not count:
+                continue
+            delta = {category: spent.get(category, 0.0) - before_spent.get(category, 0.0) for category in TIME_CATEGORIES}
+            lines.append(
+                f"{count:6d} {(total - before_total) / count:8.3f} {delta['db'] / count:8.3f} "
+                f"{delta['api'] / count:8.3f} {delta['telegram'] / count:8.3f}  {key}"
+            )
+
+        lines += ["", "Collapsed stacks (flamegraph.pl / speedscope):"]
+        for stack, count in self.stacks.most_common():
+            lines.append(f"{';'.join(stack)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Семплінг стеку потоку циклу подій з окремого потоку; одночасно працює лише один прогін"""
+
+    def __init__(self, interval: float, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, seconds: float, on_done: Callable[[ProfileResult], Awaitable[None]]) -> bool:
+        """Запустити профілювання у фоні; False - попередній прогін ще триває"""
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self._run(seconds, on_done))
+        return True
+
+    async def _run(self, seconds: float, on_done: Callable[[ProfileResult], Awaitable[None]]):
+        try:
+            result = await self.profile(seconds)
+            await on_done(result)
+        except Exception as e:
+            logger.error(f"Profiler run failed: {str(e)}")
+
+    async def profile(self, seconds: float) -> ProfileResult:
+        loop_thread_id = threading.get_ident()
+        stacks: Counter = Counter()
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(loop_thread_id, stacks, stop), daemon=True)
+
+        started_at = datetime.utcnow()
+        handlers_before = handler_stats.snapshot()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            sampler.join()
+        logger.info(f"Profiled event loop for {seconds}s: {sum(stacks.values())} samples")
+
+        return ProfileResult(
+            started_at=started_at,
+            duration=time.perf_counter() - started,
+            interval=self.interval,
+            stacks=stacks,
+            handlers_before=handlers_before,
+            handlers_after=handler_stats.snapshot()
+        )
+
+    def _sample(self, thread_id: int, stacks: Counter, stop: threading.Event):
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stacks[tuple(reversed(stack))] += 1
+
+
+profiler = SamplingProfiler(interval=settings.PROFILER_INTERVAL_MS / 1000)
@@ -1,104 +1,266 @@
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, JobEvent
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
-from datetime import datetime
-from sqlalchemy import select
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from database import async_session_maker
-from models import User
+from models import Order, User
 from order_processor import order_processor
+from price_cache import price_cache
+from price_history import purge_price_history
+from broadcast import Broadcaster
+from outbox import NotificationDispatcher
+from access import user_access_cache
+from flight_recorder import TickRecord, flight_recorder
+from metrics import ORDER_CHECK_INTERVAL_SECONDS, ORDER_NEAREST_DISTANCE, ORDER_TICK_SECONDS, ORDER_TICKS_MISSED
+from config import settings
 from aiogram import Bot
 import logging
+import random
+import time
 
 logger = logging.getLogger(__name__)
 
+PROCESS_ORDERS_JOB_ID = "process_orders"
+
+
+@dataclass
+class TickStats:
+    """Лічильники тіків обробки ордерів"""
+    runs: int = 0
+    missed_runs: int = 0
+    last_duration: float = 0.0
+    max_duration: float = 0.0
+    total_duration: float = 0.0
+    next_interval: float = 0.0
+    nearest_distance: Optional[float] = None
+    
+    @property
+    def avg_duration(self) -> float:
+        return self.total_duration / self.runs if self.runs else 0.0
+
+
+def next_check_interval(distance: Optional[float]) -> float:
+    """Секунди до наступного тіку: мінімум біля цілі, максимум далеко від неї або без ордерів"""
+    shortest, longest = settings.ORDER_CHECK_MIN_SECONDS, settings.ORDER_CHECK_MAX_SECONDS
+    near, far = settings.ORDER_CHECK_NEAR_DISTANCE, settings.ORDER_CHECK_FAR_DISTANCE
+    
+    if distance is None or distance >= far:
+        interval = longest
+    elif distance <= near:
+        interval = shortest
+    else:
+        # Геометрична інтерполяція: інтервал росте однаково на кожен відсоток відстані
+        interval = shortest * (longest / shortest) ** ((distance - near) / (far - near))
+    
+    jitter = settings.ORDER_CHECK_JITTER
+    return max(interval * (1 + random.uniform(-jitter, jitter)), 1.0)
+
 
 class BotScheduler:
     def __init__(self, bot: Bot):
         self.bot = bot
         self.scheduler = AsyncIOScheduler()
+        self.broadcaster = Broadcaster(
+            bot,
+            rate_per_second=settings.BROADCAST_RATE_PER_SECOND,
+            concurrency=settings.BROADCAST_CONCURRENCY,
+            max_retries=settings.BROADCAST_MAX_RETRIES
+        )
+        self.outbox = NotificationDispatcher(
+            bot,
+            async_session_maker,
+            limiter=self.broadcaster.limiter,
+            workers=settings.OUTBOX_WORKERS,
+            batch_size=settings.OUTBOX_BATCH_SIZE,
+            poll_seconds=settings.OUTBOX_POLL_SECONDS,
+            lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+            max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            retry_base_seconds=settings.OUTBOX_RETRY_BASE_SECONDS,
+            on_blocked=self._mark_bot_blocked
+        )
+        self.tick_stats = TickStats()
+        self._next_check_at: Optional[datetime] = None
+        self.scheduler.add_listener(self._on_job_skipped, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
     
     async def check_and_process_orders(self):
         logger.info("Starting order processing...")
+        started = time.monotonic()
+        distance = None
+        tick = TickRecord()
         
-        async with async_session_maker() as session:
-            try:
-                executed_orders = await order_processor.process_orders(session)
-                
-                for order_info in executed_orders:
-                    await self._notify_order_executed(order_info)
+        try:
+            executed_orders = await order_processor.process_orders(tick)
+            
+            if executed_orders:
+                # Повідомлення вже записані в outbox разом з покупками
+                self.outbox.wake()
+                logger.info(f"Processed {len(executed_orders)} orders")
+            
+            with tick.phase("distance"):
+                async with async_session_maker() as session:
+                    distance = await self._nearest_target_distance(session)
                 
-                if executed_orders:
-                    logger.info(f"Processed {len(executed_orders)} orders")
-                    
-            except Exception as e:
-                logger.error(f"Error in order processing: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error in order processing: {str(e)}")
+            tick.error = str(e)
+        
+        tick.nearest_distance = distance
+        tick.finish()
+        await flight_recorder.add(tick)
+        
+        duration = time.monotonic() - started
+        stats = self.tick_stats
+        stats.runs += 1
+        stats.last_duration = duration
+        stats.max_duration = max(stats.max_duration, duration)
+        stats.total_duration += duration
+        stats.nearest_distance = distance
+        ORDER_TICK_SECONDS.observe(duration)
+        if distance is not None:
+            ORDER_NEAREST_DISTANCE.set(distance)
+    
+    async def _nearest_target_distance(self, session: AsyncSession) -> Optional[float]:
+        """Відносна відстань від ціни до найвищої активної цілі; 0 - ордер уже можна виконати"""
+        snapshot = price_cache.snapshot
+        if snapshot is None:
+            return None
+        
+        result = await session.execute(
+            select(Order.is_2fa, func.max(Order.target_price))
+            .where(Order.status == "active")
+            .group_by(Order.is_2fa)
+        )
+        distances = [
+            (snapshot.price_for(is_2fa) - best_target) / snapshot.price_for(is_2fa)
+            for is_2fa, best_target in result.all()
+            if snapshot.price_for(is_2fa) > 0
+        ]
+        return max(min(distances), 0.0) if distances else None
+    
+    async def _run_adaptive_check(self):
+        if self._next_check_at is not None:
+            # Якщо цикл подій затримав запуск більше ніж на інтервал, перевірки вважаються пропущеними
+            lateness = (datetime.now(timezone.utc) - self._next_check_at).total_seconds()
+            if self.tick_stats.next_interval and lateness > self.tick_stats.next_interval:
+                missed = int(lateness // self.tick_stats.next_interval)
+                self.tick_stats.missed_runs += missed
+                ORDER_TICKS_MISSED.inc(missed)
+        try:
+            await self.check_and_process_orders()
+        finally:
+            self._schedule_next_check(next_check_interval(self.tick_stats.nearest_distance))
+    
+    def _schedule_next_check(self, interval: float):
+        """Наступний тік планується лише після завершення поточного, тому тіки не перекриваються"""
+        self.tick_stats.next_interval = interval
+        ORDER_CHECK_INTERVAL_SECONDS.set(interval)
+        self._next_check_at = datetime.now(timezone.utc) + timedelta(seconds=interval)
+        self.scheduler.add_job(
+            self._run_adaptive_check,
+            trigger=DateTrigger(run_date=self._next_check_at),
+            id=PROCESS_ORDERS_JOB_ID,
+            replace_existing=True,
+            misfire_grace_time=None
+        )
+        
+        distance = self.tick_stats.nearest_distance
+        distance_text = f"{distance:.1%}" if distance is not None else "n/a"
+        logger.info(
+            f"Next order check in {interval:.0f}s (nearest target distance: {distance_text}, "
+            f"last tick: {self.tick_stats.last_duration:.2f}s, missed: {self.tick_stats.missed_runs})"
+        )
+    
+    def _on_job_skipped(self, event: JobEvent):
+        if event.job_id == PROCESS_ORDERS_JOB_ID:
+            self.tick_stats.missed_runs += 1
+            ORDER_TICKS_MISSED.inc()
+            logger.warning("Order check skipped: previous tick still running or scheduler overloaded")
     
     async def send_price_notifications(self):
         logger.info("Sending price notifications...")
         
         try:
-            prices = await order_processor.get_current_prices()
+            snapshot = await price_cache.get_snapshot()
             
             async with async_session_maker() as session:
-                query = select(User).where(User.is_blocked == False)
+                query = select(User.id).where(User.is_blocked == False, User.bot_blocked_at.is_(None))
                 result = await session.execute(query)
-                users = result.scalars().all()
-                
-                message = (
-                    f"📊 <b>Актуальні ціни на акаунти</b>\n\n"
-                    f"Без 2FA: <b>${prices['no_2fa']:.2f}</b>\n"
-                    f"З 2FA: <b>${prices['2fa']:.2f}</b>\n\n"
-                    f"🕐 Оновлено: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
-                )
-                
-                for user in users:
-                    try:
-                        await self.bot.send_message(chat_id=user.id, text=message, parse_mode="HTML")
-                    except Exception as e:
-                        logger.error(f"Failed to send to user {user.id}: {str(e)}")
-                
-                logger.info(f"Sent to {len(users)} users")
+                user_ids = result.scalars().all()
+            
+            message = (
+                f"📊 <b>Актуальні ціни на акаунти</b>\n\n"
+                f"Без 2FA: <b>${snapshot.no_2fa:.2f}</b>\n"
+                f"З 2FA: <b>${snapshot.with_2fa:.2f}</b>\n\n"
+                f"🕐 Оновлено: {snapshot.fetched_at.strftime('%d.%m.%Y %H:%M')}"
+            )
+            
+            report = await self.broadcaster.broadcast(user_ids, message, parse_mode="HTML")
+            
+            if report.blocked_user_ids:
+                await self._mark_bot_blocked(report.blocked_user_ids)
                 
         except Exception as e:
             logger.error(f"Error sending notifications: {str(e)}")
     
-    async def _notify_order_executed(self, order_info: dict):
-        from keyboards import order_card_buttons
-        
-        message = (
-            f"✅ <b>Ордер #{order_info['order_id']} виконано!</b>\n\n"
-            f"Куплено: <b>{order_info['accounts_count']}</b> акаунтів\n"
-            f"Ціна: <b>${order_info['price_paid']:.2f}</b> за шт\n"
-            f"Загальна сума: <b>${order_info['total_price']:.2f}</b>\n"
-            f"Pack ID: <code>{order_info['pack_id']}</code>\n\n"
-            f"Акаунти збережено в системі ✓"
-        )
-        
+    async def purge_price_history(self):
         try:
-            await self.bot.send_message(
-                chat_id=order_info['user_id'],
-                text=message,
-                parse_mode="HTML",
-                reply_markup=order_card_buttons(order_info['order_id'], has_accounts=True)
-            )
+            async with async_session_maker() as session:
+                await purge_price_history(session)
         except Exception as e:
-            logger.error(f"Failed to notify user: {str(e)}")
+            logger.error(f"Error purging price history: {str(e)}")
+    
+    async def _mark_bot_blocked(self, user_ids: List[int]):
+        """Не слати розсилок тим, хто заблокував бота; доступ (is_blocked) при цьому не змінюється"""
+        async with async_session_maker() as session:
+            await session.execute(update(User).where(User.id.in_(user_ids)).values(bot_blocked_at=datetime.utcnow()))
+            await session.commit()
+        # Наступне оновлення від користувача має пройти через БД і зняти позначку
+        user_access_cache.invalidate(*user_ids)
+        logger.info(f"Marked {len(user_ids)} users as having blocked the bot")
     
     def start(self, price_check_interval: int = 5, notification_interval: int = 60):
-        self.scheduler.add_job(
-            self.check_and_process_orders,
-            trigger=IntervalTrigger(minutes=price_check_interval),
-            id="process_orders"
-        )
+        if settings.ORDER_CHECK_ADAPTIVE:
+            self._schedule_next_check(settings.ORDER_CHECK_MIN_SECONDS)
+        else:
+            ORDER_CHECK_INTERVAL_SECONDS.set(price_check_interval * 60)
+            self.scheduler.add_job(
+                self.check_and_process_orders,
+                trigger=IntervalTrigger(minutes=price_check_interval),
+                id=PROCESS_ORDERS_JOB_ID,
+                max_instances=1,
+                coalesce=True
+            )
         
         self.scheduler.add_job(
             self.send_price_notifications,
             trigger=IntervalTrigger(minutes=notification_interval),
-            id="price_notifications"
+            id="price_notifications",
+            max_instances=1,
+            coalesce=True
+        )
+        
+        self.scheduler.add_job(
+            self.purge_price_history,
+            trigger=IntervalTrigger(minutes=settings.PRICE_HISTORY_PURGE_INTERVAL_MINUTES),
+            id="purge_price_history",
+            max_instances=1,
+            coalesce=True
         )
         
         self.scheduler.start()
+        self.outbox.start()
         logger.info(f"Scheduler started")
     
+    def add_job(self, func, minutes: int, job_id: str):
+        """Додаткова періодична задача обслуговування"""
+        self.scheduler.add_job(func, trigger=IntervalTrigger(minutes=minutes), id=job_id)
+    
     def shutdown(self):
+        self.outbox.stop()
         self.scheduler.shutdown()
         logger.info("Scheduler stopped")
@@ -0,0 +1,93 @@
+from typing import Any, Dict
+from sqlalchemy import case, func, select, true, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Order, Purchase, UserStats
+
+
+async def _upsert_stats(session: AsyncSession, values: Dict[str, Any], overwrite: bool) -> bool:
+    """Вставити рядок зведення одним запитом; False - рядок уже є і overwrite=False"""
+    dialect = session.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(UserStats).values(**values)
+        if overwrite:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[UserStats.user_id],
+                set_={key: stmt.excluded[key] for key in values if key != "user_id"}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[UserStats.user_id])
+        result = await session.execute(stmt)
+        return result.rowcount > 0
+
+    stats = await session.get(UserStats, values["user_id"])
+    if stats is None:
+        session.add(UserStats(**values))
+        await session.flush()
+        return True
+    if overwrite:
+        for key, value in values.items():
+            setattr(stats, key, value)
+        await session.flush()
+    return overwrite
+
+
+async def _compute_totals(session: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """Лічильники зведення з вихідних таблиць одним запитом з умовною агрегацією"""
+    orders_totals = select(
+        func.coalesce(func.sum(case((Order.status == "active", 1), else_=0)), 0).label("orders_active"),
+        func.coalesce(func.sum(case((Order.status == "completed", 1), else_=0)), 0).label("orders_completed"),
+        func.coalesce(func.sum(case((Order.status == "cancelled", 1), else_=0)), 0).label("orders_cancelled"),
+    ).where(Order.user_id == user_id).subquery()
+
+    purchases_totals = select(
+        func.coalesce(func.sum(case((Purchase.is_2fa, 0), else_=Purchase.accounts_count)), 0).label("accounts_no_2fa"),
+        func.coalesce(func.sum(case((Purchase.is_2fa, Purchase.accounts_count), else_=0)), 0).label("accounts_2fa"),
+        func.coalesce(func.sum(case((Purchase.is_2fa, 0.0), else_=Purchase.total_price)), 0.0).label("spent_no_2fa"),
+        func.coalesce(func.sum(case((Purchase.is_2fa, Purchase.total_price), else_=0.0)), 0.0).label("spent_2fa"),
+    ).join(Order, Order.id == Purchase.order_id).where(Order.user_id == user_id).subquery()
+
+    # Обидва підзапити повертають рівно один рядок
+    result = await session.execute(
+        select(orders_totals, purchases_totals).select_from(orders_totals.join(purchases_totals, true()))
+    )
+    return {"user_id": user_id, **result.one()._mapping}
+
+
+async def rebuild_user_stats(session: AsyncSession, user_id: int, persist: bool = True) -> UserStats:
+    """Перерахувати зведення користувача з вихідних таблиць"""
+    totals = await _compute_totals(session, user_id)
+    if not persist:
+        return UserStats(**totals)
+
+    await _upsert_stats(session, totals, overwrite=True)
+    return await session.get(UserStats, user_id, populate_existing=True)
+
+
+async def get_user_stats(session: AsyncSession, user_id: int, persist: bool = True) -> UserStats:
+    """Зведення користувача; відсутній рядок перераховується з вихідних таблиць (persist=False - для репліки)"""
+    stats = await session.get(UserStats, user_id)
+    if stats is None:
+        stats = await rebuild_user_stats(session, user_id, persist=persist)
+    return stats
+
+
+async def apply_stats_delta(session: AsyncSession, user_id: int, **deltas):
+    """Інкрементально змінити лічильники зведення в поточній транзакції"""
+    values = {key: getattr(UserStats, key) + delta for key, delta in deltas.items()}
+    result = await session.execute(
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(**values)
+    )
+    if result.rowcount > 0:
+        return
+
+    # Зміни вже записані в цій транзакції, тому перерахунок їх враховує
+    await session.flush()
+    totals = await _compute_totals(session, user_id)
+    if not await _upsert_stats(session, totals, overwrite=False):
+        # Рядок щойно створила паралельна транзакція; її перерахунок не бачив наших змін
+        await session.execute(update(UserStats).where(UserStats.user_id == user_id).values(**values))
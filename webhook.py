@@ -0,0 +1,110 @@
+import asyncio
+import hmac
+import json
+import logging
+import signal
+from contextlib import suppress
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Прийом оновлень через webhook з обмеженою чергою та пулом обробників"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        dp: Dispatcher,
+        path: str,
+        secret: str,
+        queue_size: int,
+        workers: int
+    ):
+        if not secret:
+            # Без секрету будь-хто, хто знайде URL, може надіслати підроблене оновлення від імені власника
+            raise RuntimeError("WEBHOOK_SECRET must be set when BOT_MODE=webhook")
+        self.bot = bot
+        self.dp = dp
+        self.path = path
+        self.secret = secret
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle_update)
+        self.app.router.add_get("/health", self.handle_health)
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), self.secret.encode()):
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except (json.JSONDecodeError, UnicodeDecodeError, ValidationError) as e:
+            logger.warning(f"Rejected malformed webhook update: {str(e)[:200]}")
+            return web.Response(status=400)
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Telegram повторить доставку пізніше
+            logger.warning("Webhook queue is full, rejecting update")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "queue": self.queue.qsize()})
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Failed to process update {update.update_id}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def run(self, host: str, port: int, webhook_url: str, allowed_updates: Optional[List[str]] = None):
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        site = web.TCPSite(runner, host=host, port=port)
+        await site.start()
+
+        await self.bot.set_webhook(
+            url=f"{webhook_url.rstrip('/')}{self.path}",
+            secret_token=self.secret,
+            allowed_updates=allowed_updates
+        )
+        logger.info(f"Webhook server listening on {host}:{port}{self.path}")
+
+        # Як і start_polling: SIGTERM/SIGINT завершують роботу штатно, з дочитуванням черги
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            with suppress(NotImplementedError):
+                loop.add_signal_handler(sig, stop.set)
+
+        try:
+            await stop.wait()
+            logger.info("Stopping webhook server...")
+        finally:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                with suppress(NotImplementedError):
+                    loop.remove_signal_handler(sig)
+            await runner.cleanup()
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=10)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self.queue.qsize()} queued updates on shutdown")
+            for task in self._worker_tasks:
+                task.cancel()